@@ -0,0 +1,320 @@
+import sys
+import json
+import random
+import platform
+from time import perf_counter
+from os import path, makedirs
+from tempfile import mkdtemp
+from multiprocessing import cpu_count
+import pymala
+
+SCRIPTS = {
+    'shops': '''root: shop
+header: !id, client, type, birthday = year "." month "." day
+shop = shop.name
+*.clientlist
+type = name
+.customer|client
+id = :id
+client = name
+year = birthday:year
+month = birthday:month
+day = birthday:day
+likes = likes
+misc = misc
+''',
+    'deep': '''root: shop
+header: !id, client
+shop = shop.name
+*.clientlist
+type = name
+.*.customer|client
+id = :id
+client = name
+likes = likes
+''',
+    'wide': '''root: shop
+header: !id, client
+shop = shop.name
+*.clientlist
+type = name
+.customer|client
+id = :id
+client = name
+attributes = :a*
+''',
+    'huge': '''header: !id, client
+shop = shop.name
+*.clientlist
+type = name
+.customer|client
+id = :id
+client = name
+likes = likes
+misc = misc
+''',
+    'html': '''mode: html
+header: !client
+shop = html.body.h1
+*.ul
+client = li
+'''}
+
+NAMES = ['Paul', 'Peter', 'Mary', 'John', 'Frank', 'Gandalf', 'Saruman', 'Sauron', 'Arwen', 'Bilbo', 'Eowyn', 'Samwise']
+SWEETS = ['sour sweets', 'licorice', 'candy bars', 'cotton candy', 'candy cane', 'chocolate', 'muffins', 'donuts', 'smurfs', 'sour bats']
+REMARKS = ['undecided', 'trouble maker', 'shop lifter?', 'always requests samples', 'lame magic tricks']
+LISTS = ['welcome', 'premium', 'unwelcome', 'banned']
+
+class CandyShop:
+    """Generates well-formed candyshop documents (see README) in various shapes. The generator is seeded, so
+    the documents are identical for every run with the same scale."""
+
+    def __init__(self, seed = 2024):
+        self.rng = random.Random(seed)
+        self.id = 0
+
+    def client(self, indent, attrs = 0):
+        """Returns a client or customer with a birthday, preferences and remarks. Additional attributes a0, a1, ...
+        widen the tag."""
+        rng = self.rng
+        self.id += 1
+        tag = 'client' if rng.random() < 0.8 else 'customer'
+        wide = ''.join([f' a{i}="{rng.randrange(1000)}"' for i in range(attrs)])
+        lines = [f'{indent}<{tag} id="{self.id}"{wide}>', f'{indent}    <name>{rng.choice(NAMES)}</name>']
+        if rng.random() < 0.5:
+            lines.append(f'{indent}    <birthday year="{rng.randrange(1930, 2010)}" month="{rng.randrange(1, 13)}" day="{rng.randrange(1, 29)}"/>')
+        lines += [f'{indent}    <likes>{rng.choice(SWEETS)}</likes>' for i in range(rng.randrange(4))]
+        lines += [f'{indent}    <misc>{rng.choice(REMARKS)}</misc>' for i in range(rng.randrange(3))]
+        lines.append(f'{indent}</{tag}>')
+        return '\n'.join(lines)
+
+    def shop(self, lists = 4, clients = 5, depth = 0, attrs = 0):
+        """Returns a shop with client lists. The depth wraps the clients into additional group tags."""
+        lines = ['<shop>', f'    <name>{self.rng.choice(NAMES)}s Candy</name>', '    <address>Candy Lane, Sugarhill</address>']
+        for l in range(lists):
+            lines += ['    <clientlist>', f'        <name>{self.rng.choice(LISTS)}</name>']
+            indent = '        '
+            for d in range(depth):
+                lines.append(f'{indent}<group level="{d}">')
+                indent += '    '
+            lines += [self.client(indent, attrs) for c in range(clients)]
+            for d in range(depth):
+                indent = indent[:-4]
+                lines.append(f'{indent}</group>')
+            lines.append('    </clientlist>')
+        lines.append('</shop>')
+        return '\n'.join(lines)
+
+    def shops(self, shops, **kwargs):
+        """Returns a multi-entity document with the given number of shops."""
+        return '<shops>\n' + '\n'.join([self.shop(**kwargs) for s in range(shops)]) + '\n</shops>\n'
+
+    def html(self, clients):
+        """Returns a html page listing clients with void tags, without optional end tags and with nested lists and tables."""
+        rng = self.rng
+        lines = ['<!DOCTYPE html>', '<html><head><meta charset="utf-8"><title>Candyshop</title></head><body>', '<h1>Blueberry</h1>', '<ul>']
+        for c in range(clients):
+            lines.append(f'<li>{rng.choice(NAMES)}<br>{rng.choice(SWEETS)}<img src="c{c}.png"><br>')
+            if rng.random() < 0.3: lines.append(f'<p>{rng.choice(REMARKS)}<hr>')
+            if rng.random() < 0.2: lines.append(f'<li>{rng.choice(NAMES)}<ul><li>{rng.choice(SWEETS)}</li><li>{rng.choice(SWEETS)}</ul>{rng.choice(REMARKS)}</li>')
+        lines += ['</ul>', '<table><tr><td>Orders<table><tr><td>licorice<td>3</tr></table>total</td><td>3</table>', '</body></html>']
+        return '\n'.join(lines) + '\n'
+
+def generate(folder, scale = 1):
+    """Writes the benchmark documents and scripts into the folder. The scale multiplies the number of entities."""
+    makedirs(folder, exist_ok = True)
+    shop = CandyShop()
+    documents = {
+        'shops': shop.shops(500 * scale),
+        'deep': shop.shops(100 * scale, depth = 12),
+        'wide': shop.shops(100 * scale, attrs = 60),
+        'huge': shop.shop(lists = 20, clients = 100 * scale),
+        'html': shop.html(2000 * scale)}
+    for name, document in documents.items():
+        with open(path.join(folder, name + ('.html' if name == 'html' else '.xml')), 'w') as f: f.write(document)
+        with open(path.join(folder, name + '.mala'), 'w') as f: f.write(SCRIPTS[name])
+    return documents
+
+def script(name):
+    """Returns a PymalaPath for the benchmark script."""
+    pymala_path = None
+    header = pymala.PymalaTable()
+    para = {}
+    for line in SCRIPTS[name].splitlines():
+        if pymala.parse_line(line, [('root', 1), ('mode', 1)], para): continue
+        if line.startswith('header:'): header.append(line.partition(':')[2])
+        else:
+            if not pymala_path: pymala_path = pymala.PymalaPath(header)
+            pymala_path.add(line)
+    return pymala_path, para
+
+def measure(function, repeat):
+    """Returns the best time of repeated calls and the number of items reported by the function."""
+    best = None
+    items = 0
+    for r in range(repeat):
+        start = perf_counter()
+        items = function()
+        elapsed = perf_counter() - start
+        if best == None or elapsed < best: best = elapsed
+    return best, items
+
+def scenarios(folder, repeat = 3, processes = None):
+    """Runs the timed scenarios and returns a dictionary with time and items per scenario. Scenarios that cannot run,
+    i.e. multiple processes on a single CPU, are recorded with the reason they were skipped."""
+    results = {}
+    def run(name, function, reps = repeat):
+        elapsed, items = measure(function, reps)
+        results[name] = {'time': round(elapsed, 6), 'items': items}
+        print(f"{name:32} {elapsed:10.3f}s {items:10}", flush = True)
+    def skip(name, reason):
+        results[name] = {'skipped': reason}
+        print(f"{name:32} skipped, {reason}", flush = True)
+
+    shops = path.join(folder, 'shops.xml')
+    def reader_next(backend = 'pymala'):
+        reader = pymala.PymalaReader(shops, root = 'shop', backend = backend)
+        n = 0
+        while reader.next(): n += 1
+        return n
+    run('reader.next', reader_next)
+    run('reader.next.expat', lambda: reader_next('expat'))
+
+    with open(path.join(folder, 'huge.xml')) as f: huge = f.read()
+    def find():
+        p = pymala.Pymala(huge)
+        p.tags('client|customer')
+        n = 0
+        while p.find(): n += 1
+        return n
+    run('pymala.find', find)
+    def browse():
+        p = pymala.Pymala(huge)
+        n = 0
+        while p.find('clientlist'):
+            e = p.extract()
+            e.tags('client|customer')
+            while e.browse():
+                n += 1
+                e.extract()
+        return n
+    run('pymala.browse', browse)
+    def extract():
+        p = pymala.Pymala(huge)
+        p.tags('client|customer')
+        n = 0
+        while p.find():
+            n += len(p.extract().collect())
+        return n
+    run('pymala.extract', extract)
+
+    for name in ('shops', 'deep', 'wide', 'html'):
+        pymala_path, para = script(name)
+        document = path.join(folder, name + ('.html' if name == 'html' else '.xml'))
+        reader = pymala.PymalaReader(document, root = para.get('root'), html = para.get('mode') == 'html')
+        entities = []
+        p = reader.next()
+        while p:
+            entities.append(p)
+            p = reader.next()
+        run(f'path.collect.{name}', lambda: sum([len(pymala_path.collect(p)) for p in entities]))
+    pymala_path, para = script('huge')
+    with open(path.join(folder, 'huge.xml')) as f: entity = pymala.Pymala(f.read())
+    run('path.collect.huge', lambda: len(pymala_path.collect(entity)))
+    run('table.output_data', lambda: sum([len(pymala_path.data.output_data()) for i in range(20)]))
+
+    requested = processes or [2, cpu_count()]
+    processes = sorted(set([1] + [effective(mp) for mp in requested])) # 1 is the reference
+    capped = sorted(set(mp for mp in requested if mp > 1 and effective(mp) == 1)) # no multiprocessing at all
+    for mp in sorted(set(requested)):
+        if mp > 1 and effective(mp) > 1 and effective(mp) != mp: print(f"{'':32} -mp {mp} runs as mp{effective(mp)} on {cpu_count()} CPUs")
+    def check(name, out, reference, what):
+        results[name]['equal'] = sorted(lines(out)) == sorted(lines(reference))
+        print(f"{'':32} output {'equals' if results[name]['equal'] else 'differs from'} {what}")
+    for name in ('shops', 'deep', 'wide', 'huge', 'html'):
+        document = path.join(folder, name + ('.html' if name == 'html' else '.xml'))
+        reference = path.join(folder, f'{name}_1_0.txt')
+        for mp in processes:
+            for chunk in ([0, 1] if name == 'shops' else [0]):
+                if mp == 1 and chunk: continue
+                out = path.join(folder, f'{name}_{mp}_{chunk}.txt')
+                argv = ['pymala', path.join(folder, name + '.mala'), '-inp', document, '-out', out, '-mp', str(mp), '-chunk', str(chunk)]
+                label = f'main.{name}.mp{mp}.chunk{chunk}'
+                run(label, lambda: pymala.main(argv) or rows(out), 1)
+                results[label]['processes'] = mp
+                if mp > 1 or chunk: check(label, out, reference, 'single process')
+        for mp in capped:
+            for chunk in ([0, 1] if name == 'shops' else [0]): skip(f'main.{name}.mp{mp}.chunk{chunk}', f"capped at 1 process on {cpu_count()} CPU")
+        if name == 'html': continue # expat cannot parse html
+        out = path.join(folder, f'{name}_expat.txt')
+        argv = ['pymala', path.join(folder, name + '.mala'), '-inp', document, '-out', out, '-mp', '1', '-backend', 'expat']
+        run(f'main.{name}.expat', lambda: pymala.main(argv) or rows(out), 1)
+        check(f'main.{name}.expat', out, reference, 'pymala backend')
+    return results
+
+def effective(mp):
+    """Returns the number of processes main uses for a requested number, which is capped at the CPU count."""
+    mp = min(mp, cpu_count())
+    return max(cpu_count() + mp if mp <= 0 else mp, 1)
+
+def lines(file):
+    with open(file) as f: return f.read().splitlines()
+
+def rows(file):
+    return len(lines(file)) - 1
+
+def compare(results, baseline, tolerance = 0.1):
+    """Prints the ratio of every scenario to the baseline. Scenarios slower than the tolerance are flagged and
+    scenarios skipped in either run are listed. Returns the number of slower scenarios."""
+    slower = 0
+    for name, base in baseline.get('results', {}).items():
+        if name not in results: print(f"{name:32} skipped, not run")
+    for name, result in results.items():
+        base = baseline.get('results', {}).get(name)
+        if 'skipped' in result or base and 'skipped' in base:
+            print(f"{name:32} skipped, {result.get('skipped') or base['skipped']}")
+            continue
+        if not base or not base['time']: continue
+        ratio = result['time'] / base['time']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = ' slower'
+            slower += 1
+        elif ratio < 1 - tolerance: flag = ' faster'
+        if result['items'] != base['items']: flag += ' items differ'
+        if result.get('equal') == False: flag += ' output differs'
+        print(f"{name:32} {base['time']:10.3f}s {result['time']:10.3f}s {ratio:8.2f}{flag}")
+    return slower
+
+def main(argv):
+    args = [('dir', 1), ('scale', 1), ('repeat', 1), ('mp', 1), ('out|output', 1), ('baseline', 1), ('help', 0)]
+    (argv, para) = pymala.parse_argv(argv[1:], args)
+    if 'help' in para or argv:
+        print("PyMaLa benchmark")
+        print("benchmark.py [options ...]")
+        print("options:")
+        print("-dir <folder>           : folder for the generated documents (default: temporary folder)")
+        print("-scale <factor>         : multiplies the number of generated entities (default: 1)")
+        print("-repeat <n>             : repetitions of the micro benchmarks, the best time counts (default: 3)")
+        print("-mp <processes>         : comma separated processes for the end-to-end runs (default: 1, 2 and all CPUs)")
+        print("                          the processes are capped at the CPU count like in pymala, scenarios left without")
+        print("                          multiprocessing are reported as skipped")
+        print("-output <json_file>     : saves the results as json file")
+        print("-out <json_file>        : shortcut for -output")
+        print("-baseline <json_file>   : compares the results with a stored result file")
+        return
+    folder = para.get('dir') or mkdtemp(prefix = 'pymala_')
+    scale = int(para.get('scale', 1))
+    generate(folder, scale)
+    processes = [int(p) for p in para['mp'].split(',')] if para.get('mp') else None
+    print(f"documents in {folder}")
+    results = scenarios(folder, int(para.get('repeat', 3)), processes)
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': cpu_count(), 'scale': scale, 'results': results}
+    if para.get('out'):
+        with open(para['out'], 'w') as f: json.dump(report, f, indent = 2)
+    if para.get('baseline'):
+        with open(para['baseline']) as f: baseline = json.load(f)
+        print(f"comparison with {para['baseline']}")
+        if compare(results, baseline): return 1
+
+if __name__ == "__main__": sys.exit(main(sys.argv))
@@ -1,9 +1,34 @@
 import re
+import os
 import sys
 import glob
-from time import time, sleep
-from os import path, listdir, chdir, getcwd
-from multiprocessing import Process, Queue, cpu_count, active_children
+import codecs
+import json
+import math
+import hashlib
+import struct
+import socket
+import socketserver
+import select
+import signal
+import threading
+import ipaddress
+import hmac
+import pickle
+import tempfile
+import sqlite3
+import fnmatch
+from collections import deque, OrderedDict
+from time import time, sleep, perf_counter
+from os import path, listdir, getcwd, remove, stat
+from multiprocessing import Process, Queue, Value, Event, Pool, cpu_count, active_children
+from queue import Empty
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.parsers import expat
+from xml.sax.saxutils import quoteattr
+try: import resource
+except ImportError: resource = None # not available on Windows
 
 class PymalaReader:
     """Defines a virtual xml (or html) file that may comprise of multiple files within a directory sharing
@@ -13,10 +38,19 @@ class PymalaReader:
     The PymalaReader allows to indiscriminately handle different delivery forms of *ml data, be it one single
     file with multiple entities, one file per entity or a mix of both."""
 
-    def __init__(self, template, root = None, chunk = 0, encoding = 'utf-8'):
+    TAG = re.compile(r'<(/?)([^\s>/]*)[^>]*?(/?)>') # close, name and empty marker of a tag in the context
+
+    def __init__(self, template, root = None, chunk = 0, encoding = 'utf-8', html = False, backend = 'pymala', progress = False, buffer = 0, context = False, listing = None):
         """Defines which files should be included as xml or html stream. The path template may contain '*' or 
         '?' placeholders for any number respectively any single character. All files matching the template 
-        will be included. By default, all files are considered to contain a single document entity. In case, a 
+        will be included. The files are found by a Discovery in a separate thread, so the first files can be 
+        read while the directories are still scanned (see wait). The queue of work items is bounded,
+        so the discovery pauses while the processes are busy instead of holding all files in memory. The listing parameter declares a file to
+        cache the found files for repeated runs. The template '-' reads the standard input. The standard input and named pipes are 
+        streams, which are never split into chunks and are read as far as data is available instead of waiting 
+        for full buffers (see __read). Instead of a template, a list of files or work items (file, start, stop) 
+        of another reader can be passed (see items). By default, all files are 
+        considered to contain a single document entity. In case, a 
         file comprises multiple entities, you have to specifiy the root parameter.
         The root defines tags that separate the entities within the document stream. If necessary, multiple 
         alternative tags can be defined separated by the '|' character. Tag definitions may contain '*' and 
@@ -30,56 +64,185 @@ class PymalaReader:
         chunks. Every process handles a chunk by opening the file, jumping to the start position, 
         searching for a root tag and is corresponding close tag to report the pymala entities. It continues 
         until the next pymala entity would start in the adjacent chunk. Operating with chunks is not suitable
-        when every file is representing a single entity."""
-        self.buffer = 131072 # 128kB
+        when every file is representing a single entity.
+        The html parameter switches the returned Pymala objects into html mode (see Pymala.__extract).
+        The backend parameter selects the parser. By default, the string scanning of the Pymala class is used, 
+        which copes with broken xml and html. The expat backend feeds the files buffer by buffer into the expat 
+        parser and returns PymalaExpat objects. It requires well-formed xml and ignores the chunk size because
+        the parser cannot start in the middle of a document.
+        The stats attribute can be assigned a Stats object to measure the reading, decoding and scanning.
+        With progress, the total size of all files is determined and the bytes read by all processes are counted
+        in the shared progress value.
+        The buffer parameter fixes the size of the blocks read from the files in kB. By default, the buffer starts
+        with 128 kB and adapts to the size of the entities and the latency of the storage (see __adapt).
+        The idle attribute can be assigned a function that is called before the reader waits for data of a 
+        stream, i.e. to flush the output rows of the entities read so far.
+        With context, a single entity document is evaluated piecewise. The root tags define the elements
+        returned one by one, while the open ancestors of the next element and their direct data, the context, 
+        are kept (see __keep). Every returned element is preceded by the context, so paths outside of the 
+        elements still find their data. The memory is limited to the context and the largest element instead 
+        of the whole document.
+        The context requires the pymala backend and disables chunks.
+        The footprint attribute can be assigned a Footprint object to record the largest entities. The budget 
+        method restricts the memory of the reader."""
+        if not backend in ('pymala', 'expat'): raise ValueError(f"invalid backend: {backend}")
+        self.opened = [] # open tags of the context: name, position and whether it contains elements
+        if context and (not root or backend != 'pymala'): raise ValueError("the context requires a root and the pymala backend")
+        self.buffer = int(buffer * 1024) if buffer > 0 else 131072 # 128kB
+        self.adaptive = buffer <= 0
+        self.floor = self.buffer # raised for storages with high latency
+        self.ceiling = 16777216 # 16MB, lowered by a memory budget
+        self.spill = 0
+        self.split = None
+        self.memory = 0
+        self.average = 0 # average entity size
+        self.rest = b''
+        self.skip = False
+        self.context = '' if context else None
+        self.stream = False
+        self.idle = None
         self.template = template
         self.chunk = chunk
         self.end_of_chunk = False
         self.encoding = encoding
+        self.html = html
+        self.backend = backend
+        self.parser = None
+        self.entities = deque()
+        self.stats = None
+        self.footprint = None
+        self.total = 0
+        self.progress = Value('q', 0) if progress else None
         self.file = None
+        self.name = None
+        self.last = -1 # byte offset of the last section read
+        self.start = None
         self.root = None
         self.end = -1
-        self.pymalas = Queue()
+        self.pymalas = Queue(4096 if isinstance(template, str) and template != '-' else 0) # the discovery waits for the processes
         if root:
-            self.root = Pymala()
+            self.root = Pymala(html = html)
             self.root.tags(root)
-        files = glob.glob(template)
-        if self.root and self.chunk > 0:
-            chunk = int(self.chunk*1048576)
-            for f in files:
-                size = path.getsize(f)
-                chunks = max(int(size / chunk) - 1, 0)
-                start = 0
-                for c in range(chunks):
-                    stop = start + chunk
-                    self.pymalas.put((f, start, stop))
-                    start = stop
-                self.pymalas.put((f, start, -1))
-        else:
-            for f in files:
-                self.pymalas.put((f, 0, -1))
+        self.chunking = self.root and self.chunk > 0 and backend == 'pymala' and not context
+        self.count = 0
+        self.scan = 0
+        self.discovery = None
+        self.discovered = threading.Event()
+        if isinstance(template, str) and template != '-':
+            self.discovery = Discovery(template, sizes = bool(self.chunking or progress), listing = listing)
+            threading.Thread(target = self.__feed, daemon = True).start()
+            return
+        for f in (['-'] if template == '-' else template):
+            if isinstance(f, tuple): # work item of another reader
+                self.pymalas.put(f)
+                self.count += 1
+            else: self.__put(f)
         self.pymalas.put(None) # end of queue
+        self.discovered.set()
+
+    def __getstate__(self):
+        """The discovery stays in the process that created the reader."""
+        state = self.__dict__.copy()
+        state['discovery'] = None
+        state['discovered'] = None
+        return state
+
+    def __feed(self):
+        """Queues the files of the discovery in a thread, so the processes can start before the scan is complete."""
+        try:
+            for file, size in self.discovery: self.__put(file, size)
+        finally:
+            self.pymalas.put(None) # end of queue
+            self.scan = self.discovery.elapsed
+            self.discovered.set()
+
+    def __put(self, file, size = -1):
+        """Queues the work items of a file. With chunks, a larger file is separated into several work items."""
+        if size < 0 and file != '-' and (self.chunking or self.progress != None) and path.isfile(file): size = path.getsize(file)
+        start = 0
+        if size > 0: self.total += size
+        if self.chunking and size > 0: # streams cannot be split
+            chunk = int(self.chunk*1048576)
+            for c in range(max(int(size / chunk) - 1, 0)):
+                stop = start + chunk
+                self.pymalas.put((file, start, stop))
+                self.count += 1
+                start = stop
+        self.pymalas.put((file, start, -1))
+        self.count += 1
+
+    def wait(self, count = None):
+        """Waits until the discovery is complete or at least count work items are queued. Returns the number of 
+        work items queued so far. As the queue of a discovery is bounded, waiting for the complete discovery 
+        requires the work items to be consumed."""
+        while not self.discovered.is_set() and (count == None or self.count < count): self.discovered.wait(0.01)
+        return self.count
    
     def next(self):
         """Retrieve the next entity from the xml (html) stream according to the template and root settings."""
-        if self.end_of_chunk: self.__close()
+        if self.stats: start = perf_counter()
+        pymala = self.__entity()
+        if self.stats: self.stats.add('reader', perf_counter() - start)
+        if self.adaptive and pymala != None and type(pymala.pymala) is str: self.__adapt(len(pymala.pymala))
+        if self.footprint and pymala != None: self.footprint.entity(pymala, self.locate)
+        return pymala
+
+    def budget(self, memory, split = None):
+        """Restricts the memory of the reader to about memory bytes. The blocks read ahead are limited to a 16th of 
+        the budget. With split tags, an entity exceeding a quarter of the budget is not kept in memory but returned 
+        as PymalaSpill, which is evaluated element by element of the split tags. Streams cannot be spilled."""
+        self.memory = memory
+        self.ceiling = max(min(int(memory / 16), 16777216), 65536)
+        self.buffer = min(self.buffer, self.ceiling)
+        self.floor = min(self.floor, self.ceiling)
+        if split and self.backend == 'pymala' and self.context == None:
+            self.spill = max(int(memory / 4), self.ceiling)
+            self.split = split
+
+    def locate(self):
+        """Returns the file and the byte offset of the last entity, i.e. to report the largest entities. The offset
+        is -1 for streams and the expat backend."""
+        if not self.start or self.start[1] < 0: return self.name, -1
+        text, origin, pos = self.start
+        return self.name, origin + len(text[:pos].encode(self.encoding))
+
+    def __entity(self):
+        """Retrieves the next entity (see next)."""
+        if self.backend == 'expat': return self.__parse()
+        if self.end_of_chunk and self.file: self.__close()
         if not self.file:
             if not self.__open(): return None
             if not self.root:
-                pymala = self.file.read().decode(self.encoding)
+                self.start = ('', 0 if not self.stream else -1, 0)
+                if self.spill and not self.stream and path.getsize(self.name) > self.spill: # oversized document entity
+                    self.__close()
+                    return PymalaSpill((self.name, 0, -1), self.split, self.encoding, self.html, self.memory)
+                pymala = self.__decode(self.__fetch(-1))
                 self.__close()
-                if pymala: return Pymala(pymala)
+                if pymala: return Pymala(pymala, self.html)
                 return None
             self.root.reset(self.__read(True))
         while self.file:
             while self.root.pymala:
-                if self.root.find(): break
+                pos = self.root.pos
+                if self.root.find(): 
+                    if self.context != None: 
+                        self.__keep(self.root.pymala[pos:self.root.pos-len(self.root.tag)])
+                        if self.opened: self.opened[-1][2] = True
+                    break
+                if self.context != None: self.__keep(self.root.pymala[pos:])
                 self.root.reset(self.__read(True))
             if self.root.pymala and self.root.tag: break
             self.__close()
             if not self.__open(): return None
             self.root.reset(self.__read(True))
         pymala = self.root.tag
+        self.start = (self.root.pymala, self.last, self.root.pos - len(self.root.tag)) # the root section is always the last one read
+        if pymala.endswith('/>'): # empty element
+            if self.context: pymala = self.context + pymala
+            return Pymala(pymala, self.html)
+        spill = self.spill and self.context == None and not self.stream
+        begin = None
         op_tag = self.root.tag[1:-1].lstrip().partition(' ')[0] ## remove tags '<>' and pick the first word
         if op_tag.startswith('/'): cl_tag = op_tag.lstrip('/')
         else: cl_tag = '/'+op_tag
@@ -104,43 +267,112 @@ class PymalaReader:
                     self.root.begin = cl.begin
                     self.root.end = cl.end
                     self.root.pos = cl.pos
-                    return Pymala(pymala)
+                    if begin != None: return self.__spilled(begin, cl.pos)
+                    if self.context: pymala = self.context + pymala
+                    return Pymala(pymala, self.html)
                 op.pos = cl.pos
                 op.end = cl.end
                 continue
             while op.find():
                 ballance += 1
             pymala += cl.pymala[cl.begin:]
+            if spill and len(pymala) > self.spill: # oversized entity, only its location is kept
+                if begin == None: begin = self.locate()[1]
+                pymala = ''
             cl.reset(self.__read(False))
             op.reset(cl.pymala)
         self.__close()
-        return Pymala(pymala)
+        if begin != None: return self.__spilled(begin, -1)
+        if self.context: pymala = self.context + pymala
+        return Pymala(pymala, self.html)
+
+    def __spilled(self, begin, pos):
+        """Returns the PymalaSpill of an oversized entity from the begin offset to the position in the root section
+        or, with a negative position, to the end of the file."""
+        end = self.last + len(self.root.pymala[:pos].encode(self.encoding)) if pos >= 0 else -1
+        return PymalaSpill((self.name, begin, end), self.split, self.encoding, self.html, self.memory)
+
+    def __keep(self, text):
+        """Appends text outside of the root elements to the context. Mere whitespace is dropped. An element closed 
+        in the context is dropped as well if it contains other elements, like a completed list of the returned 
+        elements, so only the open ancestors of the next element and their direct data, i.e. texts and leaf 
+        elements like names, are kept. The context does not grow with the document and closed siblings do not
+        add rows to the following elements."""
+        if text.isspace(): return
+        context = self.context
+        pos = 0
+        for tag in self.TAG.finditer(text):
+            close, name, empty = tag.groups()
+            if name.startswith(('!', '?')) or empty or (self.html and name.lower() in Pymala.VOID): 
+                if self.opened: self.opened[-1][2] = True
+            elif not close:
+                if self.opened: self.opened[-1][2] = True
+                context += text[pos:tag.start()]
+                pos = tag.start()
+                self.opened.append([name, len(context), False])
+            else:
+                level = len(self.opened) - 1
+                while level >= 0 and self.opened[level][0] != name: level -= 1
+                if level < 0: continue # close tag without open tag
+                name, begin, nested = self.opened[level]
+                nested = nested or level < len(self.opened) - 1 # unclosed tags within, i.e. in html
+                del self.opened[level:]
+                if nested:
+                    context = context[:begin]
+                    pos = tag.end()
+        self.context = context + text[pos:]
 
     def size(self):
-        """Returns the queue size without the stop element."""
+        """Returns the queue size without the stop element after the discovery is complete. With more work items than
+        the bounded queue of a discovery holds, this requires another process consuming them."""
+        self.wait()
         return self.pymalas.qsize() - 1
 
+    def items(self):
+        """Removes all work items (file, start, stop) from the queue and returns them as list, i.e. to distribute 
+        them to other readers."""
+        items = []
+        item = self.pymalas.get()
+        while item != None:
+            items.append(item)
+            item = self.pymalas.get()
+        self.pymalas.put(None)
+        return items
+
     def __del__(self):
         """Destructor closes the current open file."""
-        if self.file: self.file.close()
+        if self.file and self.file is not sys.stdin.buffer: self.file.close()
 
     def __close(self):
         """Closes the open document file. The next call of the next method will open a new one.
-        Also, this is the place for future clean-up proceedings.""" 
-        self.file.close()
+        Also, this is the place for future clean-up proceedings. The standard input stays open.""" 
+        if self.file is not sys.stdin.buffer: self.file.close()
         self.file = None
+        self.parser = None
+        self.rest = b''
     
     def __open(self):
         """Gets the next file item from the queue, opens it and moves the file pointer to the start position.
-        A file can be opened multiple times if the PymalaReader is used in a muliprocessing context."""
+        A file can be opened multiple times if the PymalaReader is used in a muliprocessing context. Files that
+        vanished since they were found are skipped with a warning."""
         self.file = None
         self.end_of_chunk = False
-        file = self.pymalas.get()
-        if file == None: 
-            self.pymalas.put(None)
-            return False
-        file, begin, self.end = file
-        self.file = open(file, "rb")
+        while True:
+            file = self.pymalas.get()
+            if file == None: 
+                self.pymalas.put(None)
+                return False
+            file, begin, self.end = file
+            if file == '-' or path.exists(file): break
+            print(f"{file} skipped as it does not exist", file = sys.stderr, flush = True)
+        self.name = file
+        if self.context != None: 
+            self.context = ''
+            self.opened = []
+        self.stream = file == '-' or not path.isfile(file)
+        self.file = sys.stdin.buffer if file == '-' else open(file, "rb")
+        self.rest = b''
+        self.skip = begin > 0
         if begin > 0: self.file.seek(begin)
         return True
     
@@ -150,26 +382,371 @@ class PymalaReader:
         tag, before a tag or after a line feed as tags have to be inline.
         When open == True, the reader is looking for open root tags, otherwise it closes an open root tag.
         The reader cannot search for open root tags beyond the chunk limit.
-        The end parameter declares a chunk boundary that cannot be crossed except to complete a tag."""
+        The end parameter declares a chunk boundary that cannot be crossed except to complete a tag.
+        The file is read in blocks of the buffer size. The section is completed by searching the block for the 
+        next tag boundary, while the remainder of the block is kept for the next section. As sections are cut at 
+        '<', '>' or line feeds, multi-byte characters of ascii compatible encodings are never split. A chunk
+        starting in the middle of the file skips everything before the first tag.
+        A stream does not wait for a full block. The section ends at the last tag boundary of the data available, 
+        so an entity is returned as soon as its closing tag has arrived."""
         buffer = self.buffer
         if self.end > 0:
-            buffer = min(self.end - self.file.tell(), buffer)
+            buffer = min(self.end - self.file.tell() + len(self.rest), buffer)
             if buffer <= 0:
                 self.end_of_chunk = True
                 if open: return ''
                 buffer = self.buffer
-        chunk = self.file.read(buffer)
-        rest = b''
-        chr = self.file.read(1)
-        while chr:
-            if chr in b'<>\n':
-                if chr == b'<': self.file.seek(-1, 1)
-                else: rest += chr
+        data = self.rest
+        start = buffer
+        while True:
+            if len(data) > start:
+                cut = [pos for pos in (data.find(b'<', start), data.find(b'>', start)+1, data.find(b'\n', start)+1) if pos > 0]
+                if cut:
+                    cut = min(cut)
+                    break
+                start = len(data)
+            if self.stream and data:
+                cut = max(data.rfind(b'<'), data.rfind(b'>')+1, data.rfind(b'\n')+1)
+                if cut > 0: break
+            chunk = self.__fetch(self.buffer)
+            if not chunk: 
+                cut = len(data)
                 break
-            rest += chr
-            chr = self.file.read(1)
-        chunk += rest
-        return chunk.decode(self.encoding)
+            if self.skip:
+                pos = chunk.find(b'<') # the first tag of a chunk is always complete
+                if pos < 0: continue
+                chunk = chunk[pos:]
+                self.skip = False
+            data += chunk
+        self.last = -1 if self.stream else self.file.tell() - len(data)
+        self.rest = data[cut:]
+        return self.__decode(data[:cut])
+
+    def __adapt(self, size):
+        """Adapts the buffer to the average entity size. A buffer accomodates at least 8 average entities but 
+        stays between 128 kB, or more for storages with high latency, and 16 MB or the ceiling of a budget."""
+        self.average = size if not self.average else 0.9 * self.average + 0.1 * size
+        self.buffer = max(min(int(self.average * 8), self.ceiling), self.floor)
+
+    def __fetch(self, size):
+        """Reads size bytes from the current file, measuring the time and counting the progress if required.
+        A slow read of a full block doubles the buffer to reduce the number of reads on storages with high 
+        latency. A stream returns the data available and calls the idle function before it would block."""
+        if self.stream and size > 0:
+            if self.idle and self.__blocking(): self.idle()
+            read = self.file.read1
+        else: read = self.file.read
+        if self.stats or self.adaptive: start = perf_counter()
+        chunk = read(size)
+        if self.stats or self.adaptive: 
+            elapsed = perf_counter() - start
+            if self.stats: self.stats.add('reader.read', elapsed)
+            if self.adaptive and not self.stream and elapsed > 0.01 and len(chunk) == self.buffer and self.buffer < self.ceiling: 
+                self.floor = self.buffer = min(self.buffer * 2, self.ceiling)
+        if self.progress != None:
+            with self.progress.get_lock(): self.progress.value += len(chunk)
+        return chunk
+
+    def __blocking(self):
+        """Returns True if no data of the stream is ready. Where streams do not support select, i.e. pipes on 
+        Windows, reading is assumed to block."""
+        try: return not select.select([self.file], [], [], 0)[0]
+        except (OSError, ValueError): return True
+
+    def __decode(self, chunk, final = False):
+        """Decodes a byte chunk, measuring the time if required. The expat backend uses an incremental decoder
+        to keep multi-byte characters at buffer edges intact."""
+        if self.stats: start = perf_counter()
+        if self.parser != None: chunk = self.decoder.decode(chunk, final)
+        else: chunk = chunk.decode(self.encoding)
+        if self.stats: self.stats.add('reader.decode', perf_counter() - start)
+        return chunk
+
+    def __parse(self):
+        """Feeds the expat parser buffer by buffer until at least one entity is complete and returns it."""
+        while not self.entities:
+            if not self.file:
+                if not self.__open(): return None
+                self.__parser()
+            chunk = self.__fetch(self.buffer)
+            try:
+                if chunk:
+                    self.parser.Parse(self.__decode(chunk), False)
+                    continue
+                self.parser.Parse(self.__decode(b'', True), True)
+            except expat.ExpatError as e: raise SyntaxError(f"malformed xml in {self.name}: {e}") from None
+            if not self.root and self.events: self.entities.append(PymalaExpat(self.events))
+            self.__close()
+        return self.entities.popleft()
+
+    def __parser(self):
+        """Creates an expat parser for the current file. The input is decoded beforehand, so the parser does not
+        depend on the encodings it supports itself. Without root, the whole document is one entity."""
+        self.parser = expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.__start
+        self.parser.EndElementHandler = self.__end
+        self.parser.CharacterDataHandler = self.__data
+        self.decoder = codecs.getincrementaldecoder(self.encoding)()
+        self.events = None if self.root else []
+        self.stack = []
+        self.text = []
+
+    def __start(self, name, attrs):
+        """Expat handler for start tags. Outside of an entity, it checks for a root tag."""
+        tag = '<' + name + ''.join([f' {k}={quoteattr(v)}' for k, v in attrs.items()]) + '>'
+        if self.events == None:
+            if not [exp for sub in self.root.look.values() for exp in sub if exp.match(tag)]: return
+            self.events = []
+        self.__flush()
+        event = [tag, attrs, 0]
+        self.events.append(event)
+        self.stack.append(event)
+
+    def __end(self, name):
+        """Expat handler for end tags. Completes the entity when the root tag is closed."""
+        if self.events == None: return
+        self.__flush()
+        self.events.append(('</' + name + '>',))
+        self.stack.pop()[2] = len(self.events)
+        if not self.stack and self.root:
+            self.entities.append(PymalaExpat(self.events))
+            self.events = None
+
+    def __data(self, data):
+        """Expat handler for character data."""
+        if self.events != None: self.text.append(data)
+
+    def __flush(self):
+        """Stores the character data collected since the last tag as content."""
+        if self.text:
+            content = ''.join(self.text).strip()
+            if content: self.events.append(content)
+            self.text = []
+
+class PymalaSpill:
+    """Stands in for an entity exceeding the memory budget of a PymalaReader. Instead of the text, it holds the work 
+    item (file, begin, end) of the entity and the split tags by level (see PymalaPath.split). PymalaPath.collect 
+    evaluates it element by element of the first split tag. Every element is wrapped in the shell of the entity, 
+    i.e. everything outside of the elements, so paths outside of the elements find their data wherever it is. An 
+    element exceeding the budget itself is split by the next tag, so the entity is never kept in memory as a whole."""
+
+    def __init__(self, item, split, encoding = 'utf-8', html = False, memory = 268435456):
+        self.pymala = None # no text to cache
+        self.item = item
+        self.split = split
+        self.encoding = encoding
+        self.html = html
+        self.memory = memory # budget of the reader
+        self.shell = ('', '') # text of the enclosing shells before and after the entity
+        file, begin, end = item
+        self.size = (end if end >= 0 else path.getsize(file)) - begin
+
+    def reader(self):
+        """Returns a reader for the elements of the first split tag, which spills elements exceeding the budget."""
+        reader = PymalaReader([self.item], root = self.split[0], encoding = self.encoding, html = self.html)
+        reader.budget(self.memory, self.split[1:])
+        return reader
+
+    def elements(self, stats = None, check = None):
+        """Yields the elements of the entity wrapped in its shell as Pymala objects or, if they exceed the budget, as 
+        PymalaSpill objects carrying the shell. Consecutive elements are wrapped together up to the ceiling of the 
+        reader blocks. An entity without elements yields its shell alone. If the check function rejects the shell, 
+        the entity is yielded as a whole with a warning. The elements are read twice, first to 
+        gather the shell and the byte ranges of the batches, and then the batches as a whole."""
+        file, begin, end = self.item
+        reader = self.reader()
+        reader.stats = stats
+        ceiling = reader.ceiling
+        shell = []
+        pieces = [] # positions of the first and last element in the shell and the byte range of a batch or a PymalaSpill
+        chars = 0
+        batch = None
+        with open(file, 'rb') as f:
+            last = begin
+            for first, stop, element in self.__ranges(reader):
+                gap = self.__gap(f, last, first)
+                shell.append(gap)
+                chars += len(gap)
+                last = stop
+                if isinstance(element, PymalaSpill):
+                    pieces.append((chars, chars, element))
+                    batch = None
+                elif batch and batch[2][1] - batch[2][0] < ceiling: 
+                    batch[1] = chars
+                    batch[2] = (batch[2][0], stop)
+                else:
+                    batch = [chars, chars, (first, stop)]
+                    pieces.append(batch)
+            shell.append(self.__gap(f, last, end))
+            text = ''.join(shell)
+            before, after = self.shell
+            if check and not check(Pymala(text, self.html)):
+                print(f"{file}: the entity at byte {begin} is evaluated as a whole, as the data outside of its {self.split[0]} elements repeats", file = sys.stderr, flush = True)
+                f.seek(begin)
+                yield Pymala(before + f.read(end - begin if end >= 0 else -1).decode(self.encoding) + after, self.html)
+                return
+            for first, last, element in pieces:
+                if isinstance(element, PymalaSpill):
+                    element.shell = (before + text[:first], text[first:] + after)
+                    yield element
+                    continue
+                f.seek(element[0])
+                span = f.read(element[1] - element[0]).decode(self.encoding)
+                yield Pymala(before + text[:first] + span + text[last:] + after, self.html)
+        if not pieces: yield Pymala(before + text + after, self.html)
+
+    def __gap(self, f, begin, end):
+        """Returns the text of the shell between two elements. Mere whitespace is dropped, so it does not pile up 
+        in the shell."""
+        f.seek(begin)
+        text = f.read(end - begin if end >= 0 else -1).decode(self.encoding)
+        return '' if text.isspace() else text
+
+    def __ranges(self, reader):
+        """Yields the byte ranges of the elements of the reader with the elements."""
+        element = reader.next()
+        while element:
+            if isinstance(element, PymalaSpill): first, stop = element.item[1:]
+            else:
+                first = reader.locate()[1]
+                stop = first + len(element.pymala.encode(self.encoding))
+            yield first, stop, element
+            element = reader.next()
+
+class Discovery:
+    """Finds the files matching an input template like glob, but lists the directories with os.scandir in parallel
+    threads. The files are returned in the order of a sequential scan as soon as their directory is listed, while 
+    the next directories are already listed in the background. This hides the latency of network file systems
+    with millions of files. Only a limited number of directories is listed ahead of the returned files, so the 
+    memory does not grow with the tree. With a listing file, the found files and their sizes are saved after a complete scan 
+    together with the modification times of the listed directories. A later discovery with the same template reads
+    the listing instead of scanning the directories again, unless a directory was changed, i.e. a file was added,
+    removed or renamed, which only requires a stat of every directory."""
+
+    def __init__(self, template, sizes = False, listing = None, threads = 16, ahead = 64):
+        """With sizes, the size of every file is determined during the scan, otherwise it is -1. The ahead parameter
+        limits the directories listed in advance."""
+        self.template = template
+        self.sizes = sizes
+        self.listing = listing
+        self.threads = threads
+        self.ahead = ahead
+        self.patterns = []
+        self.pool = None
+        self.folders = deque() # listed directories with their modification times, not yet in the listing file
+        self.cached = False
+        self.elapsed = 0
+
+    def __iter__(self):
+        """Yields the files with their sizes."""
+        start = perf_counter()
+        if self.listing and path.exists(self.listing) and self.__valid():
+            self.cached = True
+            with open(self.listing, encoding = 'utf-8') as f:
+                f.readline()
+                for line in f:
+                    size, file = line.rstrip('\n').split('\t', 1)
+                    if size != 'd': yield file, int(size)
+            self.elapsed = perf_counter() - start
+            return
+        drive, folder = path.splitdrive(self.template)
+        parts = folder.replace(path.altsep or path.sep, path.sep).split(path.sep)
+        magic = [i for i, part in enumerate(parts) if re.search('[*?[]', part)]
+        if not magic: # a single file
+            if path.lexists(self.template): yield self.template, self.__size(self.template)
+            self.elapsed = perf_counter() - start
+            return
+        base = path.sep.join(parts[:magic[0]])
+        if not base and magic[0] > 0: base = path.sep # root directory
+        base = drive + base
+        self.patterns = parts[magic[0]:]
+        listing = open(self.listing + '.tmp', 'w', encoding = 'utf-8') if self.listing else None
+        if listing: listing.write(self.template+'\n')
+        self.pool = ThreadPoolExecutor(self.threads)
+        complete = False
+        try:
+            for file, size in self.__files(base):
+                if listing: self.__write(listing, f"{size}\t{file}\n")
+                yield file, size
+            if listing: self.__write(listing)
+            complete = True
+        finally:
+            self.pool.shutdown(wait = False, cancel_futures = True)
+            if listing:
+                listing.close()
+                if complete: os.replace(self.listing + '.tmp', self.listing)
+                else: remove(self.listing + '.tmp')
+            self.elapsed = perf_counter() - start
+
+    def __files(self, base):
+        """Yields the files of the directories matching the template in order. The directories still to be listed
+        are kept on a stack with the next one on top. Before a listing is taken, the listings of the next 
+        directories on the stack are started, but never more than ahead."""
+        last = len(self.patterns) - 1
+        stack = [[base, 0, None]] # folder, level and future of the listing
+        while stack:
+            for item in stack[:-self.ahead-1:-1]:
+                if not item[2]: item[2] = self.pool.submit(self.__list, item[0], item[1])
+            folder, level, future = stack.pop()
+            if level == last: yield from future.result()
+            else: stack += [[folder, level+1, None] for folder in reversed(future.result())]
+
+    def __list(self, folder, level):
+        """Lists a directory in a thread. Returns the matching files with their sizes at the last level of the 
+        template, otherwise the matching subdirectories. Like glob, hidden files only match patterns starting with 
+        a dot and unreadable directories are skipped."""
+        pattern = self.patterns[level]
+        last = level == len(self.patterns) - 1
+        items = []
+        try:
+            if self.listing: self.folders.append((folder, self.__mtime(folder))) # before the listing, so later changes are noticed
+            if not re.search('[*?[]', pattern):
+                file = path.join(folder, pattern)
+                if last and path.lexists(file): items.append((file, self.__size(file)))
+                elif not last and path.isdir(file): items.append(file)
+                return items
+            with os.scandir(folder or '.') as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') and not pattern.startswith('.') or not fnmatch.fnmatch(entry.name, pattern): continue
+                    file = path.join(folder, entry.name)
+                    if last:
+                        if not entry.is_dir(): items.append((file, self.__size(entry)))
+                    elif entry.is_dir(): items.append(file)
+        except OSError: pass # unreadable directory
+        return items
+
+    def __write(self, listing, line = ''):
+        """Writes a line and the directories listed so far to the listing file."""
+        listing.write(line)
+        while self.folders:
+            folder, mtime = self.folders.popleft()
+            listing.write(f"d\t{mtime}\t{folder}\n")
+
+    def __valid(self):
+        """Tells whether the listing file belongs to the template and none of its directories has changed since. The
+        directories are checked in parallel threads."""
+        folders = []
+        with open(self.listing, encoding = 'utf-8') as f:
+            if f.readline().rstrip('\n') != self.template: return False
+            for line in f:
+                if line.startswith('d\t'):
+                    mark, mtime, folder = line.rstrip('\n').split('\t', 2)
+                    folders.append((folder, int(mtime)))
+        if not folders: return False # listing of an older version
+        with ThreadPoolExecutor(self.threads) as pool:
+            return all(pool.map(lambda item: self.__mtime(item[0]) == item[1], folders))
+
+    def __mtime(self, folder):
+        """Returns the modification time of a directory in ns or -1 if it is missing."""
+        try: return os.stat(folder or '.').st_mtime_ns
+        except OSError: return -1
+
+    def __size(self, file):
+        """Returns the size of a file or directory entry if sizes are requested."""
+        if not self.sizes: return -1
+        try: return file.stat().st_size if isinstance(file, os.DirEntry) else path.getsize(file)
+        except OSError: return -1
 
 class PymalaPath:
     """Transforms the tree structure of a Pymala document into a rectangular table. The data for the columns
@@ -179,9 +756,13 @@ class PymalaPath:
     def __init__(self, data = None):
         """Links a PymalaTable object to define the structure, i.e. order of fields, combined fields, 
         field names, of the resulting table (see PymalaPath.collect). If none is specified, 
-        every path name will constitute a column in the order of path definitions (see PymalaPath.add)."""
+        every path name will constitute a column in the order of path definitions (see PymalaPath.add).
+        The stats attribute can be assigned a Stats object to measure the costs of every path and stage.
+        The cache attribute can be assigned a Memo object to reuse the rows of repeated entities."""
         self.root = []
         self.paths = {}
+        self.stats = None
+        self.cache = None
         self.data = None
         if not data: self.data = PymalaTable()
         else:
@@ -269,13 +850,95 @@ class PymalaPath:
     def collect(self, pymala):
         """Collects the contents of the paths within the Pymala object returning a tab delimited table
         as a list. Every element represents a line of the table.
-        The structure of the table is defined by the linked PymalaTable object.""" 
+        The structure of the table is defined by the linked PymalaTable object.
+        With a cache, the rows are stored by the hash of the entity text and a repeated entity is not parsed 
+        again (see Memo). Entities of the expat backend have no text and are never cached.
+        A PymalaSpill is collected element by element, the rows of the elements are concatenated.""" 
+        if isinstance(pymala, PymalaSpill): return self.__spilled(pymala)
+        key = None
+        if self.cache and type(pymala.pymala) is str:
+            key = self.cache.key(pymala.root + pymala.pymala[pymala.begin:pymala.end]) # the text of the view
+            lines = self.cache.get(key)
+            if lines != None: return lines
         root = {None: ([(pymala, {})], [])}
-        for path, column in self.paths.values():
+        if self.stats: lines = self.__measure(root)
+        else:
+            for path, column in self.paths.values():
+                self.__expand(root[None], path, column, 0)
+            for column in self.data.table.values(): column.clear() # reseting without changing the id
+            self.__collect(root, {})
+            lines = self.data.output_data()
+        if key: self.cache.put(key, lines)
+        return lines
+
+    def split(self):
+        """Returns the tag definitions to split oversized entities by level (see PymalaReader.budget). The first tag
+        is the one all paths leading deeper than the entity's own data pass directly below the root, the next tag
+        the one they pass directly below the first and so on. A level is only split if all other paths address the
+        direct data of the level other than the tag, i.e. shop.name or a property, which is found in the shell of 
+        every element (see PymalaSpill). Returns an empty list if the paths allow no split or the table reports 
+        only one line per key (see PymalaTable)."""
+        if self.data.single: return []
+        return [tag for tag, paths in self.__levels()]
+
+    def __levels(self):
+        """Returns the split tags by level with the paths of the direct data of the level, starting at the parent 
+        of the data, i.e. [shop, name] or [clientlist, name]."""
+        levels = []
+        paths = [path for path, column in self.paths.values()]
+        level = 1
+        while True:
+            deeper = [path for path in paths if len(path) > level + 1]
+            tags = {path[level] for path in deeper}
+            if len(tags) != 1: break
+            tag = tags.pop()
+            if tag in ('*', '*?') or tag.startswith('<'): break
+            names = set(tag.lower().split('|'))
+            if any(len(path) <= level or len(path) == level + 1 and ('*' in path[level-1] or path[level] == '*?' or names & set(path[level].lower().split('|'))) for path in paths): break
+            levels.append((tag, [path[level-1:] for path in paths if len(path) == level + 1]))
+            paths = deeper
+            level += 1
+        return levels
+
+    def __spilled(self, spill):
+        """Collects the rows of an oversized entity element by element (see PymalaSpill)."""
+        levels = self.__levels()
+        paths = levels[len(levels) - len(spill.split)][1]
+        lines = []
+        for element in spill.elements(self.stats, lambda shell: self.__single(shell, paths)): lines += self.collect(element)
+        return lines
+
+    def __single(self, shell, paths):
+        """Tells whether the paths of the direct data find at most one element in the shell of a spilled entity. 
+        Repeated data would be spread over the rows of the entity (see __rectanglify), which its elements cannot 
+        reproduce."""
+        for path in paths:
+            if path[1].startswith('<'): continue # properties have a single value
+            root = {}
+            self.__expand(([(shell, root)], []), path, [], 0)
+            if sum(1 for parent, branch in root[path[0]][0] for pymala, twig in branch.get(path[1], ([], []))[0] if pymala != None) > 1: return False
+        return True
+
+    def __measure(self, root):
+        """Performs the collection like the collect method while measuring every path expansion as well as the
+        data collection and the assembly of the rows."""
+        stats = self.stats
+        begin = perf_counter()
+        for name, (path, column) in self.paths.items():
+            start = perf_counter()
             self.__expand(root[None], path, column, 0)
+            stats.add('collect.expand.'+name, perf_counter() - start)
+        start = perf_counter()
+        stats.add('collect.expand', start - begin)
         for column in self.data.table.values(): column.clear() # reseting without changing the id
         self.__collect(root, {})
-        return self.data.output_data()
+        stop = perf_counter()
+        stats.add('collect.gather', stop - start)
+        lines = self.data.output_data()
+        end = perf_counter()
+        stats.add('collect.rows', end - stop)
+        stats.add('collect', end - begin)
+        return lines
 
     def __expand(self, root, path, column, pos):
         """Recursively expands the PymalaPath tree root by root with the corresponding path elements."""
@@ -326,7 +989,11 @@ class PymalaPath:
                     prop = properties.get(id(pymala), None)
                     if prop == None:
                         pymala.reset()
-                        prop = pymala.properties()
+                        if self.stats:
+                            start = perf_counter()
+                            prop = pymala.properties()
+                            self.stats.add('collect.gather.properties', perf_counter() - start)
+                        else: prop = pymala.properties()
                         properties[id(pymala)] = prop
                     value = self.__properties(prop, tag[1:])
                 for column in columns:
@@ -565,12 +1232,36 @@ class Pymala:
     tag - Last tag encountered.
     pos - Current position within the xml/html string. Can be set to 0 to reset the parsing.
     begin - Start position of the current pymala object in the pymala string
-    end - End position of the current pymala object in the pymala string"""
+    end - End position of the current pymala object in the pymala string
+    html - Resolves void elements and optional end tags of html documents (see __extract)
+    Pymala objects are slotted views on the document string. Extractions and copies only carry references and
+    positions while sharing the compiled tag definitions (see __look)."""
     
+    __slots__ = ('pymala', 'html', 'root', 'look', 'like', 'tag', 'pos', 'begin', 'end')
+    LOOKS = {} # compiled tag definitions shared by all pymala objects
+    LIMIT = 4096 # compiled tag definitions kept, the oldest are dropped first
+    VOID = {'area', 'base', 'br', 'col', 'command', 'embed', 'hr', 'img', 'input', 'keygen', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+    OPTIONAL = {
+        'p': 'p|div|ul|ol|dl|menu|table|form|pre|blockquote|h1|h2|h3|h4|h5|h6|hr|section|article|header|footer|nav|aside|main|'
+             'details|fieldset|figure|figcaption|li|dt|dd|tr|td|th|tbody|thead|tfoot|'
+             '/div|/ul|/ol|/dl|/menu|/table|/form|/blockquote|/td|/th|/tr|/li|/dd|/body|/section|/article|/main',
+        'li': 'li|/ul|/ol|/menu',
+        'dt': 'dt|dd|/dl',
+        'dd': 'dt|dd|/dl',
+        'tr': 'tr|tbody|tfoot|/table|/tbody|/thead|/tfoot',
+        'td': 'td|th|tr|tbody|tfoot|/tr|/table|/tbody|/thead|/tfoot',
+        'th': 'td|th|tr|tbody|tfoot|/tr|/table|/tbody|/thead|/tfoot',
+        'option': 'option|optgroup|/select|/optgroup|/datalist',
+        'thead': 'tbody|tfoot|/table',
+        'tbody': 'tbody|tfoot|/table'}
+    SCOPES = {'table', 'ul', 'ol', 'dl', 'menu', 'select', 'datalist', 'div', 'form', 'blockquote', 'section', 'article', 'main'}
     
-    def __init__(self, document = ""):
-        """Initializer takes a html or xml document as a string.""" 
+    def __init__(self, document = "", html = False):
+        """Initializer takes a html or xml document as a string. In html mode, void elements like <br> or <img ...>
+        and elements with optional end tags like <p>, <li> or <td> are resolved without searching for close tags
+        that never come.""" 
         self.pymala = document
+        self.html = html
         self.root = ""
         self.look = {}
         self.like = ""
@@ -608,9 +1299,16 @@ class Pymala:
     def copy(self, deep = False):
         """Returns a copy of the object. In case of a deep copy, a copy of the pymala document will be created
         reseting begin, end and current position accordingly."""
-        new = Pymala()
-        for p in filter(lambda x : not x.startswith('_') and not callable(getattr(self, x)), dir(self)):
-            setattr(new, p, getattr(self, p))
+        new = type(self).__new__(type(self)) # bypassing the initializer, all slots are set below
+        new.pymala = self.pymala
+        new.html = self.html
+        new.root = self.root
+        new.look = self.look
+        new.like = self.like
+        new.tag = self.tag
+        new.pos = self.pos
+        new.begin = self.begin
+        new.end = self.end
         if deep:
             new.pymala = new.pymala[new.begin:new.end]
             new.pos = new.pos - new.begin
@@ -718,7 +1416,7 @@ class Pymala:
                 else: w += "=" + f.rstrip()
             k = 0
             for j in range(len(w)-1, -1, -1):
-                if not w[j].isidentifier(): 
+                if not (w[j].isidentifier() or w[j].isdigit()): 
                     k = j+1
                     break
             content = w[:k].rstrip('; ')
@@ -790,7 +1488,11 @@ class Pymala:
         Looks for the next client with status "deleted" or the end of the clientlist, i.e. </clientlist some stuff> 
         The function returns a dictionary. The keys are the parts of the tags until the first placeholder while the 
         values are lists of regular expression for the whole definition. This setup allows for efficient retrieval of 
-        multiple tags."""
+        multiple tags.
+        The converted definitions are cached and shared by all Pymala objects. Therefore, they must not be altered.
+        The cache is limited, as the tags of broken documents would let it grow forever in long running processes."""
+        look = self.LOOKS.get(like)
+        if look != None: return look
         look = {}
         for template in like.split('|'):
             if template.startswith('<') or template.endswith('>'): raise SyntaxError(f"invalid tag definition: {like}")
@@ -806,6 +1508,8 @@ class Pymala:
             else:
                 item.add(template)
                 look[key] = item
+        if len(self.LOOKS) >= self.LIMIT: del self.LOOKS[next(iter(self.LOOKS))]
+        self.LOOKS[like] = look
         return look
 
     def __find(self, look, start, end):
@@ -833,9 +1537,16 @@ class Pymala:
 
     def __extract(self, tag, start, end):
         """Looks for the corresponding end tag of the current tag.
-        The start position should be directly after the specified tag."""
+        The start position should be directly after the specified tag. In html mode, void elements end right
+        after their tag and elements with optional end tags end before the next tag implicitly closing them."""
         if tag.endswith('/>') or tag.endswith('?>') or tag.startswith('<?'): return start
         op_tag = tag[1:-1].lstrip().partition(' ')[0] # remove tags '<>' and pick the first word
+        if self.html:
+            if tag.startswith('<!'): return start # comments and doctype declarations
+            name = op_tag.lower()
+            if name in self.VOID: return start
+            closers = self.OPTIONAL.get(name)
+            if closers: return self.__optional(op_tag, closers, start, end)
         if op_tag.startswith('/'): cl_tag = op_tag.lstrip('/')
         else: cl_tag = '/'+op_tag
         op = self.__look(op_tag)
@@ -852,6 +1563,33 @@ class Pymala:
             pos, tag = self.__find(cl, pos, end)
         return end
 
+    def __optional(self, op_tag, closers, start, end):
+        """Looks for the end of an html element with an optional end tag. The element ends with its balanced end tag 
+        or before the next tag implicitly closing it, which is not consumed. The elements with required end tags whose
+        end tags close it are scopes (see SCOPES), i.e. the lists of a list item. Tags within a nested scope, like the 
+        items of a nested list, neither close nor end the element. Elements with optional end tags are no scopes, as
+        their end tags may be missing."""
+        name = op_tag.lower()
+        closers = closers.split('|')
+        scopes = [closer[1:] for closer in closers if closer.startswith('/') and closer[1:] in self.SCOPES]
+        like = '|'.join(dict.fromkeys([op_tag, '/'+op_tag] + closers + scopes))
+        look = self.__look(like.upper() if op_tag.isupper() else like)
+        ballance = 1
+        depth = 0
+        while True:
+            pos, tag = self.__find(look, start, end)
+            if not tag: return end
+            word = tag[1:-1].lstrip().partition(' ')[0].lower()
+            if depth == 0 and word in closers: return pos - len(tag)
+            if word in scopes: depth += 1
+            elif word.startswith('/') and word[1:] in scopes: depth -= 1
+            elif depth == 0:
+                if word == name: ballance += 1
+                elif word == '/'+name:
+                    ballance -= 1
+                    if ballance == 0: return pos
+            start = pos
+
     def __next(self, start):
         """Returns the next tag while progressing through the document. If there are no tags left, it returns 
         an empty string."""
@@ -868,6 +1606,138 @@ class Pymala:
         if pos < 0: pos = len(self.pymala)
         return (self.pymala[start:pos].strip(), pos)
 
+class PymalaExpat(Pymala):
+    """A Pymala object for well-formed xml documents parsed by the expat parser (see PymalaReader). Instead of a
+    document string, the pymala attribute holds a flat list of events in document order:
+    start tag - list of the reconstructed tag, the attribute dictionary and the position after the end tag
+    end tag - tuple with the reconstructed close tag
+    content - string with the stripped character data between two tags
+    The positions begin, end and pos refer to this list. All parsing methods behave like their Pymala counterparts,
+    so a PymalaPath can collect the data without knowing the backend. Empty contents are not retained and
+    entities are already resolved by the parser."""
+
+    __slots__ = ()
+
+    def clean(self):
+        """The parser already removed the whitespace surrounding the contents."""
+        return self
+
+    def find(self, like = None):
+        """Searches for the next start or end tag fitting the tag definitions (see Pymala.find)."""
+        if like and like != self.like: self.tags(like)
+        look = [item for sub in self.look.values() for item in sub]
+        events = self.pymala
+        for pos in range(self.pos, self.end):
+            event = events[pos]
+            if type(event) is str: continue
+            for exp in look:
+                if exp.match(event[0]):
+                    self.pos = pos+1
+                    self.tag = event[0]
+                    return self.tag
+        self.tag = ""
+        return ""
+
+    def browse(self, like = None):
+        """Browses for the next start tag fitting the tag definitions on the current level (see Pymala.browse).
+        Like in Pymala.browse, a close tag leaving the current level continues after the next open tag of its kind."""
+        if like and like != self.like: self.tags(like)
+        look = [item for sub in self.look.values() for item in sub]
+        events = self.pymala
+        pos = self.pos
+        while pos < self.end:
+            event = events[pos]
+            if type(event) is str:
+                pos += 1
+                continue
+            if type(event) is tuple:
+                op_tag = '<' + event[0][2:-1]
+                pos += 1
+                while pos < self.end and not (type(events[pos]) is list and events[pos][0].partition(' ')[0].rstrip('>') == op_tag): pos += 1
+                pos += 1
+                continue
+            for exp in look:
+                if exp.match(event[0]):
+                    self.pos = pos+1
+                    self.tag = event[0]
+                    return self.tag
+            pos = event[2] # skip all deeper tags to stay in level
+        return ""
+
+    def next(self):
+        """Returns the next tag while progressing through the events."""
+        events = self.pymala
+        for pos in range(self.pos, self.end):
+            if type(events[pos]) is not str:
+                self.pos = pos+1
+                self.tag = events[pos][0]
+                return self.tag
+        self.tag = ""
+        return ""
+
+    def extract(self, progress = True):
+        """Extracts the events enclosed by the current tag (see Pymala.extract)."""
+        new = self.copy()
+        new.root = self.tag
+        new.begin = self.pos
+        new.pos = self.pos
+        event = self.__event()
+        if not self.tag or event == None:
+            new.pos = new.end
+            return new
+        new.end = min(event[2], self.end)
+        if progress: self.pos = new.end
+        return new
+
+    def properties(self, tag = None):
+        """Returns the attributes of the current tag. An explicit tag will be parsed like in Pymala.properties."""
+        if tag: return super().properties(tag)
+        event = self.__event()
+        if event == None: return super().properties(self.tag) if self.tag else {}
+        return dict(event[1])
+
+    def content(self):
+        """Returns the content directly following the current position."""
+        if self.pos < self.end and type(self.pymala[self.pos]) is str: return self.pymala[self.pos]
+        return ''
+
+    def collect(self, until = None, empty = False):
+        """Collects all contents up to the end of the current level or until one of the until tags is encountered
+        (see Pymala.collect). Empty contents are never reported."""
+        events = self.pymala
+        if not until:
+            if not self.tag or self.pos == self.begin:
+                return [event for event in events[self.pos:self.end] if type(event) is str]
+            return self.extract().collect()
+        end = [item for sub in self._Pymala__look(until).values() for item in sub]
+        con = []
+        for event in events[self.pos:self.end]:
+            if type(event) is str: con.append(event)
+            else:
+                for exp in end:
+                    if exp.match(event[0]): return con
+        return con
+
+    def search(self, like):
+        """Searches for the next content matching one of the content definitions (see Pymala.search)."""
+        like = [re.compile(like_to_regex(l)) for l in like.split('|')]
+        events = self.pymala
+        for pos in range(self.pos, len(events)):
+            con = events[pos]
+            if type(con) is not str: continue
+            for exp in like:
+                if exp.match(con):
+                    self.pos = pos+1
+                    return con
+        return ""
+
+    def __event(self):
+        """Returns the start event of the current tag or None if the position has moved on."""
+        if self.pos <= 0: return None
+        event = self.pymala[self.pos-1]
+        if type(event) is list and event[0] == self.tag: return event
+        return None
+
 class Timer:
     def __init__(self):
         self.start = 0
@@ -882,6 +1752,662 @@ class Timer:
     def reset(self):
         self.elapsed = 0
 
+class Stats:
+    """Accumulates the elapsed time and the number of calls for named stages. Stage names are hierarchical, i.e. 
+    "reader.read" is a part of "reader". Instrumented objects have a stats attribute, which is None when the
+    measurement is disabled."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, elapsed, calls = 1):
+        """Adds the elapsed time of one or more calls to a stage."""
+        item = self.stages.get(stage)
+        if item == None: self.stages[stage] = [elapsed, calls]
+        else:
+            item[0] += elapsed
+            item[1] += calls
+
+    def merge(self, stats):
+        """Adds the stages of another Stats object, i.e. of a worker process."""
+        for stage, (elapsed, calls) in stats.stages.items(): self.add(stage, elapsed, calls)
+
+    def report(self):
+        """Returns the stages as text lines in hierarchical order."""
+        lines = []
+        for stage in sorted(set([stage.rsplit('.', i)[0] for stage in self.stages for i in range(stage.count('.')+1)])):
+            line = f"{'  '*stage.count('.')}{stage.rpartition('.')[2]}"
+            if stage in self.stages: 
+                elapsed, calls = self.stages[stage]
+                line += f" {round(elapsed,3)}s {calls}x"
+            lines.append(line)
+        return lines
+
+    def dump(self, file, info = None):
+        """Writes the stages and the optional info dictionary as json file."""
+        stages = {stage: {'time': round(elapsed, 6), 'calls': calls} for stage, (elapsed, calls) in self.stages.items()}
+        with open(file, 'w') as f: json.dump({'info': info or {}, 'stages': stages}, f, indent = 2)
+
+class Memo:
+    """Caches the rows of entities by a hash of their text keyed with the script (see PymalaPath.collect). The memory
+    holds up to size MB of rows and evicts the least recently used entities. With a file, the rows are also stored
+    in a sqlite database, which persists between runs and is shared by the processes. A repeated entity returns
+    the stored rows again or, with skip, no rows at all to drop the duplicates. Only the settings and the counts of 
+    hits and misses are transferred between processes, every process builds its own memory cache. Every write 
+    is committed at once, so the processes never wait long for each other. If the database stays locked, the 
+    rows are only kept in memory."""
+
+    def __init__(self, script, size = 64, file = None, skip = False):
+        """The script is the text of the script including all settings affecting the rows."""
+        self.script = hashlib.blake2b(script.encode(), digest_size = 16).digest()
+        self.size = int(size * 1048576)
+        self.file = file
+        self.skip = skip
+        self.hits = 0
+        self.misses = 0
+        self.__setstate__(self.__getstate__())
+
+    def __getstate__(self):
+        return {'script': self.script, 'size': self.size, 'file': self.file, 'skip': self.skip, 'hits': self.hits, 'misses': self.misses}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.entries = OrderedDict()
+        self.used = 0
+        self.db = None
+
+    def key(self, text):
+        """Returns the hash of an entity text."""
+        return hashlib.blake2b(text.encode(), digest_size = 16, key = self.script).digest()
+
+    def get(self, key):
+        """Returns the rows of a cached entity, an empty list for a skipped duplicate or None if it is unknown."""
+        lines = self.entries.get(key)
+        if lines != None: self.entries.move_to_end(key)
+        elif self.file:
+            try: row = self.__connect().execute('select lines from memo where key = ?', (key,)).fetchone()
+            except sqlite3.OperationalError: row = None # locked by another process
+            if row: lines = self.__store(key, json.loads(row[0]))
+        if lines == None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [] if self.skip else lines
+
+    def put(self, key, lines):
+        """Stores the rows of an entity."""
+        self.__store(key, lines)
+        if self.file:
+            try:
+                with self.__connect(): self.db.execute('insert or ignore into memo values (?, ?)', (key, json.dumps(lines)))
+            except sqlite3.OperationalError: pass # locked by another process, the rows stay in memory
+
+    def merge(self, memo):
+        """Adds the counts of another Memo object, i.e. of a worker process."""
+        self.hits += memo.hits
+        self.misses += memo.misses
+
+    def close(self):
+        """Closes the database."""
+        if self.db:
+            self.db.close()
+            self.db = None
+
+    def __store(self, key, lines):
+        """Keeps the rows in memory and evicts the least recently used entities exceeding the size."""
+        self.entries[key] = lines
+        self.used += self.__cost(lines)
+        while self.used > self.size and self.entries:
+            self.used -= self.__cost(self.entries.popitem(last = False)[1])
+        return lines
+
+    def __cost(self, lines):
+        """Estimates the memory of an entry in bytes."""
+        return 150 + sum([len(line) + 60 for line in lines])
+
+    def __connect(self):
+        """Opens the database on first use, so every process has its own connection."""
+        if not self.db:
+            db = sqlite3.connect(self.file, timeout = 10)
+            db.execute('pragma journal_mode = wal')
+            db.execute('pragma synchronous = normal') # no sync per commit in wal mode
+            db.execute('create table if not exists memo (key blob primary key, lines text)')
+            self.db = db
+        return self.db
+
+class Progress:
+    """Periodically reports the throughput of a running conversion to stderr. The processed bytes are taken from the
+    shared progress value of a PymalaReader."""
+
+    def __init__(self, reader, interval = 5):
+        self.reader = reader
+        self.interval = interval
+        self.start = time()
+        self.due = self.start + interval
+
+    def report(self, pymalas, rows, running = 1, fill = 0, final = False):
+        """Prints a progress line if the interval has passed: processed MB of total MB, throughput in MB, entities 
+        and rows per second, active processes, the fill level of the output queue and the estimated time left."""
+        now = time()
+        if now < self.due and not final: return
+        self.due = now + self.interval
+        elapsed = max(now - self.start, 1e-9)
+        done = min(self.reader.progress.value, self.reader.total)
+        total = self.reader.total
+        percent = done / total * 100 if total else 100
+        rate = done / elapsed
+        eta = int((total - done) / rate) if rate > 0 else 0
+        print(f"progress {round(percent,1)}% {round(done/1048576,1)}/{round(total/1048576,1)}MB {round(rate/1048576,2)}MB/s "
+              f"{round(pymalas/elapsed,1)}pyml/s {round(rows/elapsed,1)}rows/s proc {running} queue {round(fill*100)}% "
+              f"eta {eta//3600}:{eta//60%60:02}:{eta%60:02}", file = sys.stderr, flush = True)
+
+class Flush:
+    """Flushes the output after a limit to keep the latency low when PyMaLa is a stage of a streaming pipeline. 
+    The limit is "entity" to flush after every entity, a number of rows or a number of seconds with the suffix 
+    "s", i.e. 2s. Pending rows are also flushed before waiting for input (see PymalaReader.idle)."""
+
+    def __init__(self, output, limit):
+        self.output = output
+        self.rows = 1
+        self.seconds = 0
+        self.pending = 0
+        self.last = time()
+        limit = str(limit).strip().lower()
+        try:
+            if limit.endswith('s'): self.seconds = float(limit[:-1])
+            elif limit != 'entity': self.rows = max(int(limit), 1)
+        except ValueError: raise SyntaxError(f"invalid flush limit: {limit}")
+
+    def written(self, rows):
+        """Counts the rows written for an entity and flushes them if the limit is reached."""
+        self.pending += rows
+        if self.seconds: due = time() - self.last >= self.seconds
+        else: due = self.pending >= self.rows
+        if due: self.flush()
+
+    def flush(self):
+        """Flushes the pending rows."""
+        if self.pending: self.output.flush()
+        self.pending = 0
+        self.last = time()
+
+class Footprint:
+    """Records the peak memory of the processes and the largest entities with their file and byte offset for -info.
+    The peak is the maximum resident set size, which is not available on Windows."""
+
+    def __init__(self, count = 5):
+        self.count = count
+        self.peaks = {}
+        self.largest = []
+
+    def entity(self, pymala, locate):
+        """Records an entity if it is among the largest. The locate function returns the file and offset, which are 
+        only determined for the largest entities. Entities of the expat backend have no text and are not recorded."""
+        if isinstance(pymala, PymalaSpill): 
+            size = pymala.size
+            locate = lambda: pymala.item[:2]
+        elif type(pymala.pymala) is str: size = len(pymala.pymala)
+        else: return
+        if len(self.largest) < self.count or size > self.largest[-1][0]: self.__add((size,) + tuple(locate()))
+
+    def measure(self, name):
+        """Records the peak memory of the current process under the name in MB."""
+        if not resource: return
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.peaks[name] = round(peak / (1048576 if sys.platform == 'darwin' else 1024), 1) # bytes on macOS, kB on Linux
+
+    def merge(self, footprint):
+        """Adds the peaks and the largest entities of another Footprint object, i.e. of a worker process."""
+        self.peaks.update(footprint.peaks)
+        for entity in footprint.largest: self.__add(entity)
+
+    def report(self):
+        """Returns the peaks and the largest entities as text lines."""
+        lines = [f"peak {name} {peak}MB" for name, peak in self.peaks.items()]
+        return lines + [f"large {round(size/1048576,3)}MB {file} {offset}" for size, file, offset in self.largest]
+
+    def __add(self, entity):
+        self.largest.append(entity)
+        self.largest.sort(key = lambda entity: entity[0], reverse = True)
+        del self.largest[self.count:]
+
+class Tuner:
+    """Chooses the number of processes and the chunk size from a short calibration probe and adapts the number of
+    active processes during the run when the output queue clogs. The probe parses the first entities of a separate
+    PymalaReader in a single process and measures the costs per entity of retrieving (reader) and parsing 
+    (collect) as well as the costs of transferring (pickle) and writing (write) the rows in the output process."""
+
+    def __init__(self, budget = 2, interval = 5):
+        """The budget limits the probe to the given number of seconds. The interval determines how often the
+        number of active processes can change."""
+        self.budget = budget
+        self.interval = interval
+        self.due = 0
+        self.limit = None
+        self.fill = []
+        self.costs = {'reader': 0, 'read': 0, 'collect': 0, 'transfer': 0, 'write': 0}
+        self.pymalas = 0
+        self.bytes = 0
+        self.total = 0
+
+    def sample(self, template, listing = None, count = 64):
+        """Returns the first files of the input template for the probe. The scan stops after count files, so 
+        the directories are not walked completely before the conversion starts."""
+        files = iter(Discovery(template, listing = listing))
+        sample = []
+        for file, size in files:
+            sample.append(file)
+            if len(sample) >= count: break
+        files.close()
+        return sample
+
+    def probe(self, reader, pymala_path, folder):
+        """Parses entities of the reader until the budget is exhausted. The rows are written to a temporary file in
+        the folder of the output file to include the file system in the measurement. The reader has to count its
+        progress (see PymalaReader) and will be exhausted afterwards. Usually, it reads a sample of the files 
+        (see sample), whose total size is the base of the chunk size."""
+        stats = Stats()
+        reader.stats = stats
+        pymala_path.stats = stats
+        stop = time() + self.budget
+        with tempfile.TemporaryFile(mode = 'w', dir = folder) as output:
+            p = reader.next()
+            while p and time() < stop:
+                self.pymalas += 1
+                lines = pymala_path.collect(p)
+                start = perf_counter()
+                lines = pickle.loads(pickle.dumps(lines))
+                stats.add('transfer', perf_counter() - start)
+                start = perf_counter()
+                for line in lines:
+                    if line: output.write(line+'\n')
+                stats.add('write', perf_counter() - start)
+                p = reader.next()
+            start = perf_counter()
+            output.flush()
+            stats.add('write', perf_counter() - start)
+        self.bytes = reader.progress.value
+        self.total = reader.total
+        reader.pymalas.cancel_join_thread() # the remaining work items are discarded
+        pymala_path.stats = None
+        for stage in self.costs: 
+            self.costs[stage] = stats.stages.get(stage, stats.stages.get('reader.'+stage, [0]))[0] / max(self.pymalas, 1)
+
+    def processes(self, cpus):
+        """Returns the number of processes that keeps the output process busy without clogging it. One cpu is 
+        reserved for the output process. If reading takes more than half of the retrieval and parsing, the file 
+        system is considered the bottleneck limiting the processes to 2."""
+        worker = self.costs['reader'] + self.costs['collect']
+        output = self.costs['transfer'] + self.costs['write']
+        mp = math.ceil(worker / output) if output > 0 else cpus
+        if worker > 0 and self.costs['read'] > worker / 2: mp = min(mp, 2)
+        return max(min(mp, cpus - 1 if cpus > 1 else 1), 1)
+
+    def chunk(self, mp):
+        """Returns the chunk size in MB providing at least 4 work items per process for the probed files, but 
+        keeping a chunk between 1 MB and 64 MB in size. More files than the sample provide more work items anyway."""
+        if mp <= 1: return 0
+        return max(min(math.ceil(self.total / 1048576 / (mp * 4)), 64), 1)
+
+    def start(self, mp):
+        """Initializes the shared limit of active processes and a gate per process, which blocks it while paused."""
+        self.limit = Value('i', mp)
+        self.gates = [Event() for i in range(mp)]
+        for gate in self.gates: gate.set()
+        self.mp = mp
+        self.due = time() + self.interval
+
+    def adapt(self, fill):
+        """Samples the fill level of the output queue. Once per interval, a process is paused if the queue was 
+        mostly full or resumed if it was mostly empty."""
+        self.fill.append(fill)
+        now = time()
+        if now < self.due: return
+        self.due = now + self.interval
+        fill = sum(self.fill) / len(self.fill)
+        self.fill = []
+        if fill > 0.9 and self.limit.value > 1: 
+            self.limit.value -= 1
+            self.gates[self.limit.value].clear()
+        elif fill < 0.5 and self.limit.value < self.mp: 
+            self.gates[self.limit.value].set()
+            self.limit.value += 1
+
+    def report(self):
+        """Returns the probe results as text line."""
+        rate = lambda cost: round(1 / cost, 1) if cost > 0 else 0
+        read = self.bytes / 1048576 / (self.costs['read'] * self.pymalas) if self.costs['read'] > 0 and self.pymalas else 0
+        return (f"probe {self.pymalas} pyml, parse {rate(self.costs['reader'] + self.costs['collect'])}pyml/s, "
+                f"write {rate(self.costs['transfer'] + self.costs['write'])}pyml/s, read {round(read, 1)}MB/s")
+
+class PymalaServer:
+    """Runs conversion jobs for clients connecting via a local unix socket or a tcp port (see serve and submit).
+    A pool of worker processes is kept alive between the jobs and the 32 most recently used compiled scripts
+    are cached by the hash of their content in the server as well as in every worker. A job consists of the
+    command line arguments and the working directory of the client, so the server reads the script and resolves
+    the paths itself. The files of a job are distributed in batches to the workers, while the server writes the 
+    rows in the original order into the output file."""
+
+    def __init__(self, processes):
+        self.pool = Pool(processes)
+        self.processes = processes
+        self.scripts = OrderedDict()
+        self.token = token()
+
+    def run(self, job):
+        """Runs a job and returns the statistics as dictionary."""
+        start = time()
+        if not hmac.compare_digest(str(job.get('token', '')), self.token): raise PermissionError("invalid token")
+        text, para = job_settings(job['argv'], job['cwd'])
+        key = hashlib.sha256(text.encode()).hexdigest()
+        pymala = compiled(self.scripts, key, text)
+        settings = reader_settings(para)
+        files = glob.glob(para['inp'])
+        size = max(math.ceil(len(files) / (self.processes * 4)), 1)
+        batches = [(key, text, files[i:i+size], settings) for i in range(0, len(files), size)]
+        if para.get('out') in (None, 'stdout'): raise SyntaxError("server jobs require an output file")
+        pymalas = 0
+        rows = 0
+        with open(para['out'], mode = 'w') as output:
+            output.write(pymala.header()+'\n')
+            for lines, n in self.pool.imap(serve_collect, batches):
+                pymalas += n
+                rows += len(lines)
+                if lines: output.write('\n'.join(lines)+'\n')
+        return {'docs': len(files), 'pyml': pymalas, 'rows': rows, 'proc': self.processes, 'time': round(time() - start, 3)}
+
+    def close(self):
+        self.pool.terminate()
+
+class PymalaHandler(socketserver.StreamRequestHandler):
+    """Reads a job as json line and responds with the statistics or the error as json line."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line: return
+        try: result = self.server.pymala.run(json.loads(line))
+        except Exception as e: result = {'error': f"{type(e).__name__}: {e}"}
+        self.wfile.write(json.dumps(result).encode()+b'\n')
+
+class PymalaCoordinator:
+    """Distributes work items (see PymalaReader.items) over tcp to workers, which may run on several machines
+    (see coordinate and work). Every worker receives the script and the settings once and then work items, while
+    the coordinator keeps two items per worker process in flight. The workers return the rows of an item at once,
+    so an item is either completely written to the output or not at all. If a worker fails, its items in flight 
+    are handed out again. Workers writing their own shards report an item after writing it, so the rows of items
+    in flight of a failed worker may be found in its shard as well as in the shard of another worker. An item whose
+    worker process died is handed out again up to RETRIES times, as it may have been killed for its memory."""
+    RETRIES = 3
+
+    def __init__(self, items, output):
+        self.pending = deque(enumerate(items))
+        self.items = len(items)
+        self.done = 0
+        self.pymalas = 0
+        self.rows = 0
+        self.workers = 0
+        self.reassigned = 0
+        self.failures = {}
+        self.error = None
+        self.output = output
+        self.lock = threading.Condition()
+        self.finished = threading.Event()
+        if not items: self.finished.set()
+
+    def take(self):
+        """Returns the next pending item or None."""
+        with self.lock:
+            return self.pending.popleft() if self.pending else None
+
+    def complete(self, result):
+        """Writes the rows of a completed item and counts it."""
+        with self.lock:
+            lines = result.get('lines')
+            if lines: self.output.write('\n'.join(lines)+'\n')
+            self.pymalas += result['pyml']
+            self.rows += result['rows']
+            self.done += 1
+            if self.done == self.items: self.finished.set()
+            self.lock.notify_all()
+
+    def fail(self, items):
+        """Returns the items of a failed worker to the pending items."""
+        with self.lock:
+            self.pending.extendleft(items)
+            self.reassigned += len(items)
+            self.lock.notify_all()
+
+    def retry(self, item, reason):
+        """Returns an item whose worker process died to the pending items or stops the distribution if it failed
+        too often."""
+        failures = self.failures.get(item[0], 0) + 1
+        self.failures[item[0]] = failures
+        if failures >= self.RETRIES: self.abort(f"item {item[1]} failed {failures} times: {reason}")
+        else: self.fail([item])
+
+    def abort(self, error):
+        """Stops the distribution because an item cannot be parsed."""
+        with self.lock:
+            self.error = error
+            self.finished.set()
+            self.lock.notify_all()
+
+    def wait(self):
+        """Waits for items of failed workers or the completion."""
+        with self.lock:
+            if not self.pending and not self.finished.is_set(): self.lock.wait(1)
+
+class PymalaCoordinatorHandler(socketserver.StreamRequestHandler):
+    """Serves one worker connection of the PymalaCoordinator. Workers send a heartbeat while they are connected, so
+    a worker that does not send anything within the timeout is considered lost. A worker has to send the token of 
+    the coordinator (see token)."""
+    timeout = 60
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        flight = {}
+        try:
+            hello = json.loads(self.rfile.readline())
+            if not hmac.compare_digest(str(hello.get('token', '')), self.server.token):
+                self.send({'error': 'invalid token'})
+                return
+            self.send(self.server.job)
+            with coordinator.lock: coordinator.workers += 1
+            slots = max(int(hello.get('slots', 1)), 1) * 2
+            while True:
+                while len(flight) < slots:
+                    item = coordinator.take()
+                    if item == None: break
+                    flight[item[0]] = item
+                    self.send({'item': item[0], 'work': item[1]})
+                if not flight:
+                    if coordinator.finished.is_set(): break
+                    coordinator.wait()
+                    continue
+                line = self.rfile.readline()
+                if not line: raise ConnectionError("worker disconnected")
+                result = json.loads(line)
+                if 'alive' in result: continue # heartbeat
+                if 'failed' in result:
+                    coordinator.retry(flight.pop(result['item']), result['failed'])
+                    if coordinator.error: break
+                    continue
+                if 'error' in result: 
+                    coordinator.abort(f"worker {self.client_address[0]}: {result['error']}")
+                    break
+                coordinator.complete(result)
+                del flight[result['item']]
+            self.send({'done': True})
+        except Exception as e:
+            if flight: print(f"worker {self.client_address[0]} failed ({type(e).__name__}: {e}), reassigning {len(flight)} items", file = sys.stderr, flush = True)
+            coordinator.fail(list(flight.values()))
+
+    def send(self, message):
+        self.wfile.write(json.dumps(message).encode()+b'\n')
+        self.wfile.flush()
+
+class Watcher:
+    """Detects new and completed files matching an input template (see watch). On Linux, the directories of the 
+    template are watched with inotify, so a new file is reported as soon as it is closed after writing or moved 
+    into the directory. Otherwise, and for files present before their directory was watched, the directories are 
+    polled and a file is complete when its size and modification time did not change for the interval. Files in 
+    watched directories are polled as well, but wait for the patience, as their events may be missed, i.e. on 
+    network file systems, and all of them are polled after an overflow of the inotify queue. A file is reported 
+    again if it is replaced, i.e. its size or modification time differ from the reported signature. With append,
+    a grown file whose processed part is unchanged is reported from the end of the processed part."""
+
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_TO = 0x80
+    IN_Q_OVERFLOW = 0x4000
+    RETRIES = 3
+
+    def __init__(self, template, interval = 5, done = None, append = False, patience = 12):
+        """The done dictionary contains the signatures (size, mtime, tail) of files already processed by file name.
+        The tail is a hash of the last 4 kB of the processed part (see tail). The patience is the number of intervals
+        a file in a watched directory has to be unchanged without an event."""
+        self.template = template
+        self.interval = interval
+        self.done = done if done != None else {}
+        self.append = append
+        self.patience = patience
+        self.pending = {} # signature, time since it is unchanged and whether inotify reports its completion by file name
+        self.failures = {}
+        self.closed = set()
+        self.watches = {}
+        self.watched = set() # directories watched since the previous scan
+        self.overflow = False
+        self.inotify = None
+        try:
+            import ctypes, ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+            fd = libc.inotify_init1(getattr(os, 'O_NONBLOCK', 0))
+            if fd >= 0:
+                self.libc = libc
+                self.inotify = open(fd, 'rb', buffering = 0)
+        except (OSError, AttributeError, TypeError): pass # no inotify, polling only
+
+    def wait(self):
+        """Waits up to the interval for file events and returns the list of complete files with their signatures,
+        the offset to begin with and their previous signatures."""
+        if self.inotify:
+            self.__watch()
+            if select.select([self.inotify], [], [], self.interval)[0]: self.__events()
+        else: sleep(self.interval)
+        return self.__scan()
+
+    def retry(self, file, signature, previous):
+        """Reports a failed file again at the next scan unless it failed too often. Returns False if it is given up
+        until it changes."""
+        key = (file, signature[:2])
+        self.failures[key] = self.failures.get(key, 0) + 1
+        if self.failures[key] >= self.RETRIES: return False
+        if previous: self.done[file] = previous
+        else: self.done.pop(file, None)
+        self.closed.add(file)
+        return True
+
+    def close(self):
+        if self.inotify: self.inotify.close()
+        self.inotify = None
+
+    def tail(self, file, size):
+        """Returns the hash of the 4 kB before size, which tells whether a grown file was only appended."""
+        with open(file, 'rb') as f:
+            f.seek(max(size - 4096, 0))
+            return hashlib.blake2b(f.read(min(size, 4096)), digest_size = 16).hexdigest()
+
+    def __watch(self):
+        """Adds the directories matching the template to the inotify watches, including new ones."""
+        for folder in glob.glob(path.dirname(self.template) or '.'):
+            if folder in self.watches.values() or not path.isdir(folder): continue
+            wd = self.libc.inotify_add_watch(self.inotify.fileno(), folder.encode(), self.IN_CLOSE_WRITE | self.IN_MOVED_TO)
+            if wd >= 0: self.watches[wd] = folder
+
+    def __events(self):
+        """Reads the inotify events and marks the closed and moved files."""
+        data = self.inotify.read(65536) or b''
+        pos = 0
+        while pos + 16 <= len(data):
+            wd, mask, cookie, size = struct.unpack_from('iIII', data, pos)
+            name = data[pos+16:pos+16+size].rstrip(b'\0').decode(errors = 'replace')
+            pos += 16 + size
+            if mask & self.IN_Q_OVERFLOW: self.overflow = True # events were lost
+            elif wd in self.watches and name: self.closed.add(path.join(self.watches[wd], name))
+
+    def __scan(self):
+        """Returns the files matching the template that are complete and not done yet."""
+        now = time()
+        ready = []
+        if self.overflow: self.pending = {file: (since[0], since[1], False) for file, since in self.pending.items()}
+        for file in glob.glob(self.template):
+            try: info = stat(file)
+            except OSError: continue
+            signature = (info.st_size, info.st_mtime_ns)
+            done = self.done.get(file)
+            if not path.isfile(file) or (done and done[:2] == signature): continue
+            since = self.pending.get(file)
+            if since == None: since = (signature, now, path.dirname(file) in self.watched and not self.overflow)
+            elif since[0] != signature: since = (signature, now, since[2])
+            self.pending[file] = since
+            quiet = self.interval * (self.patience if since[2] else 1)
+            if file in self.closed or now - since[1] >= quiet:
+                try: tail = self.tail(file, signature[0])
+                except OSError: continue
+                begin = 0
+                if self.append and done and signature[0] > done[0] and self.tail(file, done[0]) == done[2]:
+                    begin = done[0] # only the appended part
+                ready.append((file, signature + (tail,), begin, done))
+                self.done[file] = signature + (tail,)
+                del self.pending[file]
+        self.closed.clear()
+        self.watched = set(self.watches.values())
+        self.overflow = False
+        return ready
+
+class Rotation:
+    """Appends rows to an output file that is rotated when it exceeds a size in MB. The parts are numbered, i.e.
+    shops.txt is continued as shops_0001.txt, shops_0002.txt and so on. Without size, all rows are appended to the 
+    output file. Every file starts with the header and an existing file is continued after a restart."""
+
+    def __init__(self, file, header, size = 0):
+        self.file = file
+        self.header = header
+        self.size = int(size * 1048576)
+        self.part = 0
+        if self.size:
+            base, ext = path.splitext(file)
+            parts = [int(f[len(base)+1:-len(ext) or None]) for f in glob.glob(glob.escape(base) + '_' + '[0-9]'*4 + ext)]
+            self.part = max(parts) if parts else 1
+        self.output = None
+        self.__open()
+
+    def write(self, lines):
+        """Writes the lines and flushes them. Returns the number of rows."""
+        rows = 0
+        for line in lines:
+            if line:
+                rows += 1
+                self.output.write(line+'\n')
+        self.output.flush()
+        if self.size and self.output.tell() >= self.size:
+            self.output.close()
+            self.part += 1
+            self.__open()
+        return rows
+
+    def close(self):
+        self.output.close()
+
+    def name(self):
+        """Returns the name of the current output file."""
+        if not self.size: return self.file
+        base, ext = path.splitext(self.file)
+        return f"{base}_{self.part:04}{ext}"
+
+    def __open(self):
+        self.output = open(self.name(), mode = 'a')
+        if not self.output.tell(): self.output.write(self.header+'\n')
+
 def like_to_regex(like):
     """Transforms a like-string with '?' (any char) and '*' (any number of chars) placeholders into a 
     regular expression string."""
@@ -924,121 +2450,548 @@ def parse_line(line, flags, para):
             return True  
     return False
 
-def mp_read_collect(reader, pymala_path, out):
+ARGS = [('inp|input', 1), ('out|output', 1), ('root', 1), ('chunk', 1), ('mp', 1), ('rp', 1), ('info',0), ('encoding', 1), ('mode', 1), ('html', 0), ('backend', 1), ('stats', 1), ('progress', 0), ('buffer', 1), ('server', 1), ('coordinator', 1), ('flush', 1), ('watch', 1), ('rotate', 1), ('cache', 1), ('cachefile', 1), ('duplicates', 1), ('stream', 1), ('listing', 1), ('memory', 1)]
+
+def load_script(text, para):
+    """Compiles the text of a script file into a PymalaPath. The settings of the script are added to the para
+    dictionary unless they are already defined."""
+    header = PymalaTable()
+    pymala = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            pass
+        elif parse_line(line, ARGS, para):
+            pass
+        elif re.match("header\\s*:.*", line):
+            if pymala: raise SyntaxError("headers have to be declared before pymalas")
+            header.append(line.partition(':')[2])
+        else: 
+            if not pymala: pymala = PymalaPath(header)
+            pymala.add(line)
+    if not pymala: raise SyntaxError("no paths defined")
+    if pymala.missing(): raise SyntaxError(f"undefined header field: {', '.join(pymala.missing())}")
+    return pymala
+
+def job_settings(argv, cwd):
+    """Reads the script of the command line arguments relative to the working directory and returns its text and 
+    the settings. The paths of the settings are made absolute relative to the folder of the script."""
+    (argv, para) = parse_argv(argv, ARGS)
+    if not argv: raise SyntaxError("no script file specified")
+    script = path.realpath(path.join(cwd, argv[0]))
+    if not path.splitext(script)[1] and not path.isfile(script): script += ".mala"
+    para["script"] = script
+    if argv[1:]: raise SyntaxError(f"invalid parameter: {' '.join(argv[1:])}")
+    with open(script, "rb") as f: text = f.read().decode()
+    load_settings(text, para)
+    folder = path.dirname(script) # adjusting paths to PyMaLa script
+    if "inp" in para and para["inp"] != '-': para["inp"] = path.realpath(path.join(folder, para["inp"]))
+    if para.get("out", 'stdout') != 'stdout': para["out"] = path.realpath(path.join(folder, para["out"]))
+    for name in ("stats", "cachefile", "listing"):
+        if para.get(name): para[name] = path.realpath(path.join(folder, para[name]))
+    return text, para
+
+def load_settings(text, para):
+    """Adds the settings of a script to the para dictionary unless they are already defined without compiling the
+    paths, i.e. for a client submitting the script to a server."""
+    for line in text.splitlines(): parse_line(line.strip(), ARGS, para)
+
+def reader_settings(para):
+    """Validates the settings concerning the PymalaReader and returns them as keyword dictionary."""
+    mode = para.get('mode', 'xml').lower()
+    if mode not in ('xml', 'html'): raise SyntaxError(f"invalid mode: {mode}")
+    html = mode == 'html' or para.get('html') == 'True'
+    backend = para.get('backend', 'pymala').lower()
+    if backend not in ('pymala', 'expat'): raise SyntaxError(f"invalid backend: {backend}")
+    if html and backend == 'expat': raise SyntaxError("the expat backend requires well-formed xml")
+    if para.get('stream'):
+        if para.get('root'): raise SyntaxError("stream and root exclude each other")
+        if backend == 'expat': raise SyntaxError("stream requires the pymala backend")
+    return {'root': para.get('stream') or para.get('root'), 'encoding': para.get('encoding', 'utf-8'), 'html': html, 'backend': backend, 
+            'buffer': float(para.get('buffer', 0)), 'context': bool(para.get('stream'))}
+
+def mp_read_collect(reader, pymala_path, out, index = 0, gate = None, inflight = None, cap = 0):
+    """Collects the rows of the entities in a worker process and puts them into the output queue. The process 
+    waits for its gate before every entity while it is paused by the Tuner. With a memory budget, the shared inflight value counts the bytes of the rows in the queue, which may not exceed the cap.
+    An error is forwarded to the main process, which always receives the final None of the worker."""
+    try: read_collect(reader, pymala_path, out, index, gate, inflight, cap)
+    except Exception as e: out.put(e)
+    finally: out.put(None)
+
+def read_collect(reader, pymala_path, out, index, gate, inflight, cap):
+    """Collects the rows of the entities for mp_read_collect."""
+    stats = reader.stats
+    if gate: gate.wait()
     p = reader.next()
     while not p == None:
         lines = pymala_path.collect(p)
-        out.put(lines)
+        if inflight:
+            size = sum(map(len, lines))
+            while inflight.value and inflight.value + size > cap: sleep(0.01) # backpressure of the output process
+            with inflight.get_lock(): inflight.value += size
+        if stats:
+            start = perf_counter()
+            out.put(lines)
+            stats.add('queue.put', perf_counter() - start)
+        else: out.put(lines)
+        if gate: gate.wait()
+        p = reader.next()
+    if stats: out.put(stats)
+    if reader.footprint:
+        reader.footprint.measure(f"proc{index+1}")
+        out.put(reader.footprint)
+    if pymala_path.cache:
+        pymala_path.cache.close()
+        out.put(pymala_path.cache)
+
+def serve_collect(batch):
+    """Collects the rows of a batch of files in a worker process of the PymalaServer. Compiled scripts are cached
+    by the hash of their content."""
+    key, text, files, settings = batch
+    pymala = compiled(serve_collect.scripts, key, text)
+    reader = PymalaReader(files, **settings)
+    lines = []
+    pymalas = 0
+    p = reader.next()
+    while p:
+        pymalas += 1
+        lines += [line for line in pymala.collect(p) if line]
         p = reader.next()
-    out.put(None)
+    return lines, pymalas
+serve_collect.scripts = OrderedDict()
+
+def compiled(scripts, key, text, limit = 32):
+    """Returns the compiled script of a text from a cache of the most recently used scripts by the key."""
+    pymala = scripts.get(key)
+    if pymala: scripts.move_to_end(key)
+    else:
+        pymala = load_script(text, {})
+        scripts[key] = pymala
+        if len(scripts) > limit: scripts.popitem(last = False)
+    return pymala
+
+def token():
+    """Returns the shared secret of servers, coordinators and their clients from the environment variable
+    PYMALA_TOKEN. Jobs and workers with another token are rejected."""
+    return os.environ.get('PYMALA_TOKEN', '')
+
+def loopback(host):
+    """Tells whether a host name only refers to loopback addresses."""
+    try: return all([ipaddress.ip_address(info[4][0]).is_loopback for info in socket.getaddrinfo(host, None)])
+    except (socket.gaierror, ValueError): return False
+
+def address(server):
+    """Returns the socket family and address of a server declaration: host:port, :port or a unix socket file."""
+    host, sep, port = server.rpartition(':')
+    if sep and port.isdigit(): return socket.AF_INET, (host or 'localhost', int(port))
+    if not hasattr(socket, 'AF_UNIX'): raise SyntaxError(f"unix sockets are not supported on this platform: {server}")
+    return socket.AF_UNIX, server
+
+def serve(argv):
+    """Starts the PymalaServer (see main)."""
+    (argv, para) = parse_argv(argv[1:], [('server', 1), ('mp', 1)])
+    if argv: raise SyntaxError(f"invalid parameter: {' '.join(argv)}")
+    mp = int(para.get('mp', cpu_count()))
+    if mp <= 0: mp = cpu_count() + mp
+    family, server = address(para.get('server', 'localhost:8765'))
+    if family == socket.AF_UNIX:
+        if path.exists(server): remove(server)
+        listener = socketserver.ThreadingUnixStreamServer(server, PymalaHandler)
+        os.chmod(server, 0o600) # only the user of the server may submit jobs
+    else: 
+        if not token() and not loopback(server[0]): raise SyntaxError(f"a token is required for the non-local address {server[0]} (see PYMALA_TOKEN)")
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        listener = socketserver.ThreadingTCPServer(server, PymalaHandler)
+    listener.pymala = PymalaServer(max(mp, 1))
+    print(f"pymala server on {para.get('server', 'localhost:8765')} with {max(mp, 1)} processes", file = sys.stderr, flush = True)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0)) # clean up when terminated
+    try: listener.serve_forever()
+    except KeyboardInterrupt: pass
+    finally:
+        listener.server_close()
+        listener.pymala.close()
+        if family == socket.AF_UNIX and path.exists(server): remove(server)
+
+def submit(server, argv, para):
+    """Submits a job to a PymalaServer and reports the statistics like main. The job consists of the command line
+    arguments, the working directory and the token (see token)."""
+    family, server = address(server)
+    job = {'argv': argv, 'cwd': getcwd(), 'token': token()}
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.connect(server)
+        connection.sendall(json.dumps(job).encode()+b'\n')
+        result = json.loads(connection.makefile('rb').readline())
+    if 'error' in result: raise RuntimeError(f"server: {result['error']}")
+    if 'info' in para: print(f"docs {result['docs']}\npyml {result['pyml']}\nrows {result['rows']}\nproc {result['proc']}\ntime {result['time']}s")
+
+def coordinate(server, text, para, items, header):
+    """Runs the PymalaCoordinator on the address until all items are completed (see main)."""
+    family, server = address(server)
+    if family != socket.AF_INET: raise SyntaxError(f"the coordinator requires a tcp address: {server}")
+    if not token() and not loopback(server[0]): raise SyntaxError(f"a token is required for the non-local address {server[0]} (see PYMALA_TOKEN)")
+    output = open(para.get('out'), mode = 'w') if not para.get('out') in (None, 'stdout') else sys.stdout
+    output.write(header+'\n')
+    t = Timer()
+    t.go()
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    listener = socketserver.ThreadingTCPServer(server, PymalaCoordinatorHandler)
+    listener.daemon_threads = True
+    listener.coordinator = PymalaCoordinator(items, output)
+    listener.token = token()
+    listener.job = {'script': text, 'para': {k: v for k, v in para.items() if not k in ('coordinator', 'out', 'stats', 'progress')}}
+    thread = threading.Thread(target = listener.serve_forever)
+    thread.start()
+    try: listener.coordinator.finished.wait()
+    finally:
+        listener.shutdown()
+        listener.server_close()
+        t.stop()
+        if output != sys.stdout: output.close()
+    c = listener.coordinator
+    if c.error: raise RuntimeError(c.error)
+    if 'info' in para: print(f"docs {c.items}\npyml {c.pymalas}\nrows {c.rows}\nwork {c.workers}\nreassigned {c.reassigned}\ntime {round(t.elapsed,3)}s")
+
+def work(argv):
+    """Runs a worker for a PymalaCoordinator (see main). The worker tries to connect for 60 seconds and sends a 
+    heartbeat every 10 seconds. If a process of the worker dies, i.e. killed for its memory, the items in flight 
+    are reported as failed, so the coordinator hands them out again, and the processes are replaced."""
+    (argv, para) = parse_argv(argv[1:], [('coordinator', 1), ('mp', 1), ('out|output', 1)])
+    if argv or not para.get('coordinator'): raise SyntaxError(f"invalid parameter: {' '.join(argv) or 'no coordinator'}")
+    mp = int(para.get('mp', cpu_count()))
+    if mp <= 0: mp = cpu_count() + mp
+    mp = max(mp, 1)
+    family, server = address(para['coordinator'])
+    connection = None
+    stop = time() + 60
+    while not connection:
+        try: connection = socket.create_connection(server)
+        except ConnectionRefusedError:
+            if time() > stop: raise
+            sleep(0.5)
+    shard = open(para['out'], mode = 'a') if para.get('out') else None
+    lock = threading.Lock()
+    stream = connection.makefile('rwb')
+    def send(message):
+        with lock:
+            stream.write(json.dumps(message).encode()+b'\n')
+            stream.flush()
+    send({'hello': socket.gethostname(), 'slots': mp, 'token': token()})
+    job = json.loads(stream.readline())
+    if 'error' in job: raise PermissionError(f"coordinator: {job['error']}")
+    key = hashlib.sha256(job['script'].encode()).hexdigest()
+    settings = reader_settings(job['para'])
+    pool = ProcessPoolExecutor(mp)
+    alive = threading.Event()
+    def heartbeat():
+        while not alive.wait(10):
+            try: send({'alive': True})
+            except OSError: return
+    def done(item, future):
+        try: lines, pymalas = future.result()
+        except BrokenProcessPool: return send({'item': item, 'failed': "worker process died"})
+        except Exception as e: return send({'item': item, 'error': f"{type(e).__name__}: {e}"})
+        if shard:
+            with lock:
+                if lines: shard.write('\n'.join(lines)+'\n')
+                shard.flush()
+            send({'item': item, 'pyml': pymalas, 'rows': len(lines)})
+        else: send({'item': item, 'pyml': pymalas, 'rows': len(lines), 'lines': lines})
+    threading.Thread(target = heartbeat, daemon = True).start()
+    try:
+        line = stream.readline()
+        while line:
+            message = json.loads(line)
+            if message.get('done'): break
+            item = message['item']
+            batch = (key, job['script'], [tuple(message['work'])], settings)
+            try: future = pool.submit(serve_collect, batch)
+            except BrokenProcessPool: # replaces the processes after one died
+                pool.shutdown(wait = False)
+                pool = ProcessPoolExecutor(mp)
+                future = pool.submit(serve_collect, batch)
+            future.add_done_callback(lambda future, item = item: done(item, future))
+            line = stream.readline()
+        pool.shutdown()
+    finally:
+        alive.set()
+        pool.shutdown(wait = False, cancel_futures = True)
+        connection.close()
+        if shard: shard.close()
+
+def detach():
+    """Ignores interrupts in a worker process, so Ctrl+C for the group of the main process does not kill a worker 
+    while it holds a lock of the pool. The main process terminates the workers itself."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def watch(text, para, header, settings, mp):
+    """Processes the files matching the input template as they arrive until it is interrupted (see main). The pool
+    of processes stays alive and every file is handled as a whole by one process. The processed files are 
+    recorded with their signatures in a ledger next to the output file, so a restart does not repeat them. A file 
+    that fails, also because its process died, is retried up to 3 times (see Watcher.retry). With root, only the 
+    appended part of a grown file is processed."""
+    if para.get('out') in (None, 'stdout'): raise SyntaxError("the watch mode requires an output file")
+    ledger = para['out'] + '.done'
+    done = {}
+    if path.exists(ledger):
+        with open(ledger) as f:
+            for line in f:
+                size, mtime, tail, file = line.rstrip('\n').split('\t', 3)
+                done[file] = (int(size), int(mtime), tail)
+    watcher = Watcher(para['inp'], float(para['watch']), done, append = bool(para.get('root')))
+    output = Rotation(para['out'], header, float(para.get('rotate', 0)))
+    key = hashlib.sha256(text.encode()).hexdigest()
+    lock = threading.Lock()
+    failures = []
+    count = {'docs': 0, 'pyml': 0, 'rows': 0}
+    def complete(report, future):
+        file, signature, begin, previous = report
+        try: lines, pymalas = future.result()
+        except Exception as e:
+            print(f"{file} failed ({type(e).__name__}: {e})", file = sys.stderr, flush = True)
+            with lock: failures.append(report)
+            return
+        with lock:
+            rows = output.write(lines)
+            with open(ledger, 'a') as f: f.write(f"{signature[0]}\t{signature[1]}\t{signature[2]}\t{file}\n")
+            count['docs'] += 1
+            count['pyml'] += pymalas
+            count['rows'] += rows
+        if 'info' in para: print(f"{file} pyml {pymalas} rows {rows}", flush = True)
+    pool = ProcessPoolExecutor(mp, initializer = detach)
+    print(f"pymala watching {para['inp']} {'with inotify' if watcher.inotify else 'by polling'} and {mp} processes", file = sys.stderr, flush = True)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0)) # clean up when terminated
+    t = Timer()
+    t.go()
+    try:
+        while True:
+            with lock:
+                for file, signature, begin, previous in failures:
+                    if not watcher.retry(file, signature, previous): print(f"{file} given up until it changes", file = sys.stderr, flush = True)
+                failures.clear()
+            for report in watcher.wait():
+                file, signature, begin, previous = report
+                batch = (key, text, [(file, begin, -1)], settings)
+                try: future = pool.submit(serve_collect, batch)
+                except BrokenProcessPool: # replaces the processes after one died
+                    pool.shutdown(wait = False)
+                    pool = ProcessPoolExecutor(mp, initializer = detach)
+                    future = pool.submit(serve_collect, batch)
+                future.add_done_callback(lambda future, report = report: complete(report, future))
+    except KeyboardInterrupt: pass
+    finally:
+        for process in active_children(): process.terminate() # the files in progress are repeated after a restart
+        pool.shutdown(cancel_futures = True)
+        watcher.close()
+        with lock: output.close()
+        t.stop()
+        if 'info' in para: print(f"docs {count['docs']}\npyml {count['pyml']}\nrows {count['rows']}\nproc {mp}\ntime {round(t.elapsed,3)}s")
 
 def main(argv):
     if len(argv) <= 1:
         print("PyMaLa - python markup-language to flat file converter")
         print("version 2024.02.22")
         print("pymala.py <script-file> [options ...]")
+        print("pymala.py serve [-server <address>] [-mp <processes>]")
+        print("pymala.py work -coordinator <address> [-mp <processes>] [-out <shard_file>]")
         print("options:")
         print("-input <input_template> : declares the document files using placeholders (* = any no of chars, ? = single char)")
         print("                          i.e.: -inp data*\\doc_*.xml")
         print('                          browse through directories starting with "data" selecting xml files starting with "doc_"')
+        print("                          - reads the standard input, named pipes are read as streams as well")
         print("-inp <input_template>   : shortcut for -input")
+        print("-listing <file>         : caches the list of input files with their sizes for repeated runs with the same template")
         print("-output <output_file>   : target file for the tab-delimited data")
         print("-out <output_file>      : shortcut for -output")
         print("-root <root>            : root tag definintion identifying an entity (only required for multi-entity files)")
+        print("-stream <tags>          : evaluates a giant single-entity file element by element of the given tags")
+        print("                          the open ancestors of an element and their direct data are kept as its context")
         print("-mp <processes>         : activates multiprocessing by assigning a number of processes to the task")
         print("                          if the no is negative or zero, it declares the CPUs not used for the task")
         print("                          file access may become a bottleneck for large numbers of assigned processes")
+        print("                          auto chooses the processes by a short probe and pauses processes when clogging")
         print("-chunk <size>           : separates larger multi-entity files into chunks of <size> MB to enable multiprocessing")
         print("                          every chunk is considered a separate file to be distributed to a process")
         print("                          requires a distinct root definition and should not be applied for single-entity files")
+        print("                          auto chooses the size by the total size of the files and the number of processes")
         print('-encoding <enc>         : declares the encoding of the document files, e.g. latin1, ansi, utf-8 (default)')
+        print('-mode <mode>            : declares the markup language of the document files, i.e. xml (default) or html')
+        print('-html                   : shortcut for -mode html, resolves void elements like <br> and optional end tags like </p>')
+        print('-backend <backend>      : declares the parser, i.e. pymala (default) or expat (faster but requires well-formed xml)')
+        print('-buffer <size>          : fixes the size of the blocks read from the document files in kB')
+        print('                          by default, it adapts to the size of the entities and the latency of the storage')
+        print('-memory <size>          : limits the memory to about <size> MB by smaller blocks and fewer rows in flight')
+        print('                          entities exceeding the budget are evaluated element by element like -stream')
         print('-info                   : concludes with some statistics (requires "true" or "false" as setting in the script)')
         print('                          docs = number of documents or chunks, pymala = number of pymala entities,')
         print('                          rows = number of lines in output, proc = number of processes,')
         print('                          clog = congestion of output process (it cannot keep pace with parsing if close to 100%)')
+        print('                          scan = time to discover the input files, which overlaps with the parsing')
+        print('                          peak = peak memory per process, large = largest entities with file and byte offset')
         print('                          time = run time for parsing without initialization')
+        print('-stats <json_file>      : measures time and calls per stage and path, saved as json file and reported by -info')
+        print('                          reader = reading (read), decoding (decode) and scanning for entities')
+        print('                          collect = path expansion (expand) per path name, data collection (gather)')
+        print('                          and row assembly (rows), queue = transfer between processes, write = output')
+        print('-progress               : reports the progress every 5 seconds to stderr, i.e. processed MB, MB/s,')
+        print('                          pyml/s, rows/s, active processes, output queue fill and estimated time left')
+        print("-server <address>       : submits the job to a pymala server, i.e. host:port, :port or a unix socket file")
+        print("                          the server keeps processes and compiled scripts in memory for small jobs")
+        print("                          it is started with serve on the address (default: localhost:8765)")
+        print("                          non-local addresses require a shared secret in the environment variable PYMALA_TOKEN")
+        print("-coordinator <address>  : distributes the documents or chunks to workers on several machines (host:port or :port)")
+        print("                          a worker is started with: pymala.py work -coordinator <address> [-mp <processes>]")
+        print("                          [-out <shard_file>], it writes the rows into a local shard file instead of returning them")
+        print("                          (the rows of items in flight of a failed worker may then be written twice)")
+        print("                          non-local addresses require a shared secret in PYMALA_TOKEN on the coordinator and workers")
+        print("-flush <limit>          : flushes the output after every entity (entity), a number of rows or seconds, i.e. 2s")
+        print("                          pending rows are also flushed before waiting for input of streams (low latency)")
+        print("-watch <seconds>        : keeps running and processes new files matching the input template once they are complete")
+        print("                          inotify detects closed files immediately, otherwise the directories are polled every <seconds>")
+        print("                          processed files are recorded in <output_file>.done and skipped after a restart")
+        print("-rotate <size>          : appends the rows in watch mode to numbered output files of <size> MB, i.e. out_0001.txt")
+        print("-cache <size>           : reuses the rows of repeated entities, identified by a hash, from a cache of <size> MB")
+        print("-cachefile <file>       : stores the cached rows in a database file, which persists between runs")
+        print("-duplicates <mode>      : emit (default) writes the rows of repeated entities again, skip drops them")
+        print("                          -info reports the cache hits and misses (hits, miss)")
         print("options override corresponding settings in the script file")
         print("a setting is not preceded by a minus and its parameter is separated by a colon, i.e. info: true")
         return
-    argv = argv[1:]
-    args = [('inp|input', 1), ('out|output', 1), ('root', 1), ('chunk', 1), ('mp', 1), ('rp', 1), ('info',0), ('encoding', 1)]
-    (argv, para) = parse_argv(argv, args)
-    if not argv: raise SyntaxError("no script file specified")
-    script = path.realpath(argv[0])
-    if not path.splitext(script)[1] and not path.isfile(script): script += ".mala"
-    para["script"] = path.realpath(script)
-    argv.pop(0)
-    if argv: raise SyntaxError(f"invalid parameter: {' '.join(argv)}")
-    header = PymalaTable()
-    pymala = None
-    option = 'inp','out' in para
-    with open(para['script'], "rb") as script:
-        line = script.readline().decode()
-        while line:
-            line = line.strip()
-            if not line or line.startswith('#'):
-                pass
-            elif parse_line(line, args, para):
-                pass
-            elif re.match("header\\s*:.*", line):
-                if pymala: raise SyntaxError("headers have to be declared before pymalas")
-                header.append(line.partition(':')[2])
-            else: 
-                if not pymala: pymala = PymalaPath(header)
-                pymala.add(line)
-            line = script.readline().decode()
-    cwd = getcwd()
-    chdir(path.split(para["script"])[0])  # adjusting paths to PyMaLa script
-    if "inp" in para: para["inp"] = path.realpath(para["inp"])
-    if "out" in para: para["out"] = path.realpath(para["out"])
-    chdir(cwd)
-    mp = min(int(para.get("mp", '1')), cpu_count())
-    if mp <= 0: mp = cpu_count() + mp
-    if mp < 1: mp = 1
-    if pymala.missing(): raise SyntaxError(f"undefined header field: {', '.join(pymala.missing())}")
-    reader = PymalaReader(para['inp'], root = para.get('root'), chunk = int(para.get('chunk', 0)), encoding = para.get('encoding', 'utf-8'))
+    if argv[1] == 'serve': return serve(argv[1:])
+    if argv[1] == 'work': return work(argv[1:])
+    text, para = job_settings(argv[1:], getcwd())
+    settings = reader_settings(para)
+    stdin = para.get('inp') == '-'
+    if stdin and (para.get('server') or para.get('coordinator') or para.get('watch')): raise SyntaxError("the standard input cannot be distributed or watched")
+    if para.get('server'): return submit(para['server'], argv[1:], para) # the server compiles the script
+    pymala = load_script(text, para)
+    tuner = None
+    auto = 'auto' in (para.get('mp', '').lower(), para.get('chunk', '').lower()) and not stdin and not para.get('watch')
+    sample = Tuner().sample(para.get('inp', ''), para.get('listing')) if auto else []
+    if sample and all([path.isfile(f) for f in sample]): # a probe would consume streams
+        tuner = Tuner()
+        probe = PymalaReader(sample, progress = True, **settings)
+        tuner.probe(probe, pymala, path.split(path.realpath(para['out']))[0] if para.get('out', 'stdout') != 'stdout' else None)
+        del probe
+    if para.get('mp', '').lower() == 'auto': mp = tuner.processes(cpu_count()) if tuner else cpu_count() if para.get('watch') else 1
+    else:
+        mp = min(int(para.get("mp", '1')), cpu_count())
+        if mp <= 0: mp = cpu_count() + mp
+        if mp < 1: mp = 1
+    if stdin: mp = 1 # processes cannot share the standard input
+    if para.get('chunk', '').lower() == 'auto': chunk = tuner.chunk(mp) if tuner and para.get('root') else 0
+    else: chunk = int(para.get('chunk', 0))
+    if para.get('watch'): return watch(text, para, pymala.header(), settings, mp)
+    reader = PymalaReader(para['inp'], chunk = chunk, progress = para.get('progress') == 'True', listing = para.get('listing'), **settings)
+    if para.get('coordinator'): return coordinate(para['coordinator'], text, para, reader.items(), pymala.header())
     output = open(para.get('out'), mode = 'w') if not para.get('out') in (None, 'stdout') else sys.stdout
     output.write(pymala.header()+'\n')
-    docs = reader.size()
-    mp = min(docs, mp)
+    flush = Flush(output, para['flush']) if para.get('flush') else None
+    stats = Stats() if para.get('stats') else None
+    reader.stats = stats
+    pymala.stats = stats
+    memo = None
+    if para.get('cache') or para.get('cachefile'):
+        duplicates = para.get('duplicates', 'emit').lower()
+        if duplicates not in ('emit', 'skip'): raise SyntaxError(f"invalid duplicates: {duplicates}")
+        memo = Memo(text + json.dumps(settings, sort_keys = True), float(para.get('cache', 64)), para.get('cachefile'), duplicates == 'skip')
+    pymala.cache = memo
+    mp = min(reader.wait(mp), mp)
     qsize = mp * 4
+    footprint = Footprint() if 'info' in para else None
+    reader.footprint = footprint
+    memory = float(para.get('memory', 0)) * 1048576
+    inflight = None
+    if memory > 0: # shared evenly by the processes and the rows in flight between them
+        share = memory / (mp + 2) if mp > 1 else memory
+        split = pymala.split()
+        if not split: print("the paths allow no split, so oversized entities are kept in memory", file = sys.stderr, flush = True)
+        reader.budget(share, split)
+        if mp > 1: inflight = Value('q', 0)
+    if tuner and 'info' in para: print(f"{tuner.report()}\nauto mp {mp} chunk {chunk}MB")
     pymalas = 0 
     jam = 0
     rows = 0
+    progress = Progress(reader) if reader.progress != None else None
     t = Timer()
     t.go()
     if mp <= 1:
         call = 1
         jam = 0
+        if flush: reader.idle = flush.flush
         p = reader.next()
         while p:
             pymalas += 1
-            for line in pymala.collect(p): 
+            lines = pymala.collect(p)
+            if stats: start = perf_counter()
+            written = rows
+            for line in lines: 
                 if line:
                     rows += 1
                     output.write(line+'\n')
+            if flush: flush.written(rows - written)
+            if stats: stats.add('write', perf_counter() - start)
+            if progress: progress.report(pymalas, rows)
             p = reader.next()
     else:
         running = mp
+        error = None
         out = Queue(qsize)
+        if tuner: tuner.start(mp)
         for i in range(mp):
-            Process(target = mp_read_collect, args = (reader, pymala, out)).start()
+            Process(target = mp_read_collect, args = (reader, pymala, out, i, tuner.gates[i] if tuner else None, inflight, int(share) if inflight else 0)).start()
         while True:
-            lines = out.get()
+            if flush and out.empty(): flush.flush() # flush before waiting for the processes
+            if stats: start = perf_counter()
+            if progress or tuner:
+                interval = progress.interval if progress else tuner.interval
+                try: lines = out.get(timeout = interval)
+                except Empty: lines = False
+                if progress: progress.report(pymalas, rows, min(running, tuner.limit.value) if tuner else running, out.qsize()/qsize)
+                if tuner: tuner.adapt(out.qsize()/qsize)
+                if lines is False: continue
+            else: lines = out.get()
+            if stats: stats.add('queue.get', perf_counter() - start)
             if lines == None:
                 running -= 1
                 if not running: break
+            elif isinstance(lines, Stats): stats.merge(lines)
+            elif isinstance(lines, Memo): memo.merge(lines)
+            elif isinstance(lines, Footprint): footprint.merge(lines)
+            elif isinstance(lines, Exception): error = error or lines
             else:
+                if inflight:
+                    with inflight.get_lock(): inflight.value -= sum(map(len, lines))
                 jam += out.qsize()
                 pymalas += 1
+                if stats: start = perf_counter()
+                written = rows
                 for line in lines:
                     if line:
                         rows += 1
                         output.write(line+'\n')
+                if flush: flush.written(rows - written)
+                if stats: stats.add('write', perf_counter() - start)
+        if error:
+            if output != sys.stdout: output.close()
+            raise error
     t.stop()
+    if footprint: footprint.measure('main')
+    if memo: memo.close()
+    if progress: progress.report(pymalas, rows, 0, final = True)
     if output != sys.stdout: 
         output.flush()
         output.close()
-    if 'info' in para: print(f"docs {docs}\npyml {pymalas}\nrows {rows}\nproc {mp}\nclog {round(jam/pymalas/qsize*100,3)}%\ntime {round(t.elapsed,3)}s")
+    clog = round(jam/pymalas/qsize*100,3) if pymalas else 0
+    docs = reader.wait()
+    if 'info' in para: 
+        print(f"docs {docs}\npyml {pymalas}\nrows {rows}\nproc {mp}\nclog {clog}%\nscan {round(reader.scan,3)}s\ntime {round(t.elapsed,3)}s")
+        if memo: print(f"hits {memo.hits}\nmiss {memo.misses}")
+        for line in footprint.report(): print(line)
+        if stats: print('\n'.join(stats.report()))
+    if stats: 
+        info = {'docs': docs, 'pyml': pymalas, 'rows': rows, 'proc': mp, 'clog': clog, 'scan': round(reader.scan, 6), 'time': round(t.elapsed, 6)}
+        if memo: info.update({'hits': memo.hits, 'miss': memo.misses})
+        if footprint: info.update({'peak': footprint.peaks, 'large': [{'size': size, 'file': file, 'offset': offset} for size, file, offset in footprint.largest]})
+        stats.dump(para['stats'], info)
    
 if __name__ == "__main__": sys.exit(main(sys.argv))
@@ -0,0 +1,25 @@
+import sys
+from os import path
+
+import pytest
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import pymala
+
+
+@pytest.fixture
+def convert(tmp_path):
+    """Returns a function converting a document with a script by pymala.main and returning the output lines."""
+    runs = [0]
+    def run(document, script, *options, suffix = '.xml'):
+        runs[0] += 1
+        name = f'doc{runs[0]}'
+        if document != None:
+            with open(tmp_path / (name + suffix), 'w') as f: f.write(document)
+        with open(tmp_path / (name + '.mala'), 'w') as f: f.write(script)
+        out = tmp_path / (name + '.txt')
+        inp = ['-inp', str(tmp_path / (name + suffix))] if document != None else []
+        pymala.main(['pymala.py', str(tmp_path / (name + '.mala'))] + inp + ['-out', str(out)] + list(options))
+        with open(out) as f: return f.read().splitlines()
+    return run
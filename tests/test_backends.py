@@ -0,0 +1,29 @@
+import pytest
+from xml.parsers import expat
+
+import pymala
+
+SHOP = '<shop><name>Blueberry</name><clientlist><client id="{0}"><name a="x&amp;y &quot;z&quot; &lt;q" b=\'1"2\'>Paul</name></client></clientlist></shop>\n'
+SCRIPT = 'root: shop\nheader: !id\nshop = shop.name\n*.clientlist\n.client\nid = :id\nname = name\n'
+
+
+def test_expat_tags_are_escaped(tmp_path):
+    document = tmp_path / 'shop.xml'
+    document.write_text(SHOP.format(1))
+    p = pymala.PymalaReader(str(document), root = 'shop', backend = 'expat').next()
+    p.find('name a*')
+    expat.ParserCreate().Parse(p.tag[:-1] + '/>', True)
+    assert p.properties() == {'a': 'x&y "z" <q', 'b': '1"2'}
+
+
+def test_expat_error(convert):
+    with pytest.raises(SyntaxError, match = 'malformed xml'):
+        convert('<shop><name>Blueberry</shop>', SCRIPT, '-backend', 'expat')
+
+
+def test_expat_error_in_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(pymala, 'cpu_count', lambda: 4)
+    for i in range(6): (tmp_path / f'shop{i}.xml').write_text(SHOP.format(i) if i != 3 else '<shop><name>x</shop>')
+    (tmp_path / 'shop.mala').write_text(SCRIPT)
+    with pytest.raises(SyntaxError, match = 'shop3.xml'):
+        pymala.main(['pymala.py', str(tmp_path / 'shop.mala'), '-inp', 'shop*.xml', '-out', str(tmp_path / 'out.txt'), '-mp', '2', '-backend', 'expat'])
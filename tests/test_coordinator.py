@@ -0,0 +1,50 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import pymala
+
+SCRIPT = 'root: shop\nheader: !id\nshop = shop.name\n*.client\nid = :id\n'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def wait(port):
+    for i in range(100):
+        try: return socket.create_connection(('localhost', port)).close()
+        except ConnectionRefusedError: time.sleep(0.1)
+
+
+def test_retry_limit():
+    coordinator = pymala.PymalaCoordinator([('a.xml', 0, -1)], None)
+    item = coordinator.take()
+    for i in range(coordinator.RETRIES - 1):
+        coordinator.retry(item, 'killed')
+        assert coordinator.take() == item and not coordinator.error
+    coordinator.retry(item, 'killed')
+    assert 'failed 3 times' in coordinator.error and coordinator.finished.is_set()
+
+
+def test_distributed(tmp_path, monkeypatch):
+    monkeypatch.setenv('PYMALA_TOKEN', 'secret')
+    for i in range(4): (tmp_path / f'shop{i}.xml').write_text(f'<shop><name>s{i}</name><client id="{i}"/></shop>')
+    (tmp_path / 'shops.mala').write_text(SCRIPT)
+    port = free_port()
+    argv = ['pymala.py', str(tmp_path / 'shops.mala'), '-inp', 'shop*.xml', '-out', str(tmp_path / 'out.txt'), '-coordinator', f':{port}']
+    coordinator = threading.Thread(target = pymala.main, args = (argv,))
+    coordinator.start()
+    wait(port)
+    try:
+        monkeypatch.setenv('PYMALA_TOKEN', 'wrong')
+        with pytest.raises(PermissionError): pymala.work(['work', '-coordinator', f'localhost:{port}', '-mp', '1'])
+        monkeypatch.setenv('PYMALA_TOKEN', 'secret')
+        pymala.work(['work', '-coordinator', f'localhost:{port}', '-mp', '1'])
+    finally: coordinator.join(30)
+    rows = (tmp_path / 'out.txt').read_text().splitlines()
+    assert rows[0] == 'id\tshop' and sorted(rows[1:]) == [f'{i}\ts{i}' for i in range(4)]
@@ -0,0 +1,48 @@
+import glob
+import os
+
+import pytest
+
+import pymala
+
+
+def discover(template, listing = None):
+    discovery = pymala.Discovery(template, sizes = True, listing = listing)
+    return sorted(discovery), discovery.cached
+
+
+def test_listing_is_validated(tmp_path):
+    listing = str(tmp_path / 'listing.txt') # outside of the scanned directories
+    tmp_path = tmp_path / 'data'
+    for name in ('a', 'b'):
+        os.makedirs(tmp_path / name)
+        (tmp_path / name / 'shop.xml').write_text(name)
+    template = str(tmp_path / '*' / '*.xml')
+    files, cached = discover(template, listing)
+    assert [file for file, size in files] == [str(tmp_path / 'a' / 'shop.xml'), str(tmp_path / 'b' / 'shop.xml')] and not cached
+    assert discover(template, listing) == (files, True)
+    os.remove(tmp_path / 'a' / 'shop.xml')
+    os.utime(tmp_path / 'a', ns = (0, 0)) # a coarse clock could miss the change
+    (tmp_path / 'b' / 'new.xml').write_text('c')
+    files, cached = discover(template, listing)
+    assert [file for file, size in files] == [str(tmp_path / 'b' / 'new.xml'), str(tmp_path / 'b' / 'shop.xml')] and not cached
+
+
+def test_vanished_file_is_skipped(tmp_path, capsys):
+    document = tmp_path / 'shop.xml'
+    document.write_text('<shop><name>Blueberry</name></shop>')
+    reader = pymala.PymalaReader([str(document), str(tmp_path / 'gone.xml')], root = 'shop')
+    assert reader.next().collect() == ['Blueberry']
+    assert reader.next() == None
+    assert 'gone.xml skipped' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize('pattern', ['*/*.xml', '*/*/shop?.xml', 'a*/b/[xy]*', 'a/*', '*/.*', 'a/b/shop1.xml', '*/missing/*'])
+def test_discovery_finds_the_files_of_glob(tmp_path, pattern):
+    for folder in ('a/b', 'a/c', 'ab/b', '.hidden'):
+        os.makedirs(tmp_path / folder)
+    for file in ('a/shop.xml', 'a/.shop.xml', 'a/b/shop1.xml', 'a/b/shop22.xml', 'a/b/x.txt', 'ab/b/y.xml', 'ab/shop.xml', '.hidden/shop.xml'):
+        (tmp_path / file).write_text('<shop/>')
+    template = str(tmp_path / pattern)
+    files = [file for file in glob.glob(template) if os.path.isfile(file)]
+    assert sorted(file for file, size in pymala.Discovery(template)) == sorted(files)
@@ -0,0 +1,61 @@
+from os import path
+
+import pytest
+
+import benchmark
+import pymala
+
+
+@pytest.fixture(scope = 'module')
+def documents(tmp_path_factory):
+    """Generates the benchmark documents once and returns their folder."""
+    folder = str(tmp_path_factory.mktemp('documents'))
+    benchmark.generate(folder)
+    return folder
+
+
+def convert(folder, name, *options):
+    out = path.join(folder, f"{name}_{'_'.join(options).replace('-', '').replace('|', '')}.txt")
+    document = path.join(folder, name + ('.html' if name == 'html' else '.xml'))
+    pymala.main(['pymala.py', path.join(folder, name + '.mala'), '-inp', document, '-out', out] + list(options))
+    with open(out) as f: return f.read().splitlines()
+
+
+@pytest.mark.parametrize('name', ['shops', 'deep', 'wide', 'huge'])
+def test_expat_backend(documents, name):
+    assert convert(documents, name, '-backend', 'expat') == convert(documents, name)
+
+
+def test_chunk_boundaries(documents):
+    document = path.join(documents, 'shops.xml')
+    whole = pymala.PymalaReader(document, root = 'shop')
+    entities = []
+    p = whole.next()
+    while p:
+        entities.append(p.pymala)
+        p = whole.next()
+    chunked = pymala.PymalaReader(document, root = 'shop', chunk = 0.05)
+    items = chunked.items()
+    assert len(items) > 10
+    pieces = []
+    for item in items:
+        reader = pymala.PymalaReader([item], root = 'shop')
+        p = reader.next()
+        while p:
+            pieces.append(p.pymala)
+            p = reader.next()
+    assert pieces == entities
+
+
+def test_chunked_processes(documents, monkeypatch):
+    monkeypatch.setattr(pymala, 'cpu_count', lambda: 4)
+    assert sorted(convert(documents, 'shops', '-mp', '2', '-chunk', '1')) == sorted(convert(documents, 'shops'))
+
+
+def test_stream(documents):
+    assert convert(documents, 'huge', '-stream', 'customer|client') == convert(documents, 'huge')
+
+
+@pytest.mark.parametrize('name', ['shops', 'deep', 'wide', 'huge'])
+def test_spill(documents, name):
+    assert convert(documents, name, '-memory', '0.1') == convert(documents, name)
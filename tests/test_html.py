@@ -0,0 +1,35 @@
+import pymala
+
+CELLS = 'mode: html\nheader: !cell\n*.table.{}tr\ncell = td\n'
+
+
+def test_void_elements(convert):
+    rows = convert('<ul><li>Paul<br>sweets<img src="p.png"><li>Mary<hr></ul>', 'mode: html\nheader: !client\n*.ul\nclient = li\n', suffix = '.html')
+    assert rows == ['client', 'Paul|sweets', 'Mary']
+
+
+def test_nested_table_without_row_end_tags(convert):
+    document = '<table><tr><td>a<table><tr><td>x<tr><td>y</table>z<td>b<tr><td>c<td>d</table>'
+    assert convert(document, CELLS.format(''), suffix = '.html') == ['cell', 'a|x|y|z', 'b', 'c', 'd']
+
+
+def test_nested_table_without_tbody_end_tags(convert):
+    document = '<table><tbody><tr><td>a<table><tbody><tr><td>x<tr><td>y</table>z<td>b<tr><td>c<td>d</table>'
+    assert convert(document, CELLS.format('tbody.'), suffix = '.html') == ['cell', 'a|x|y|z', 'b', 'c', 'd']
+
+
+def test_nested_list(convert):
+    document = '<ul><li>a<ul><li>x<li>y</ul>z<li>b</ul>'
+    assert convert(document, 'mode: html\nheader: !item\n*.ul\nitem = li\n', suffix = '.html') == ['item', 'a|x|y|z', 'b']
+
+
+def test_paragraph_closed_by_list_item():
+    p = pymala.Pymala('<ul><li><p>x<li>y</ul>', html = True)
+    p.find('p')
+    assert p.extract().collect() == ['x']
+
+
+def test_paragraph_closed_by_cell():
+    p = pymala.Pymala('<table><tr><td><p>x<td>y</table>', html = True)
+    p.find('p')
+    assert p.extract().collect() == ['x']
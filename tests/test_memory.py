@@ -0,0 +1,59 @@
+import pytest
+
+import pymala
+
+SCRIPT = 'root: shop\nheader: !id\nshop = shop.name\n*.clientlist\ntype = name\n.client\nid = :id\nname = name\nyear = birthday:year\n'
+CLIENT = '<client id="{0}"><name>Clïent{0}</name><birthday year="19{1:02}"/></client>\n'
+
+
+def clients(start, count):
+    return ''.join(CLIENT.format(i, i % 100) for i in range(start, start + count))
+
+
+DOCUMENTS = {
+    'trailing data': f'<shop><clientlist>\n{clients(0, 2000)}</clientlist><name>TheShop</name></shop>\n',
+    'sibling data': f'<shop><clientlist><name>A</name>{clients(0, 1000)}</clientlist>note<name>TheShop</name>'
+                    f'<clientlist></clientlist><clientlist>{clients(1000, 1000)}<name>B</name></clientlist></shop>\n',
+    'small entities': '<shops>' + ''.join(f'<shop><name>S{i}</name><clientlist>{clients(i, 3)}</clientlist></shop>' for i in range(100)) + '</shops>',
+    'giant element': f'<shop><name>S</name><clientlist><client id="1"><name>P</name>'
+                     + ''.join(f'<birthday year="{i}"/>' for i in range(20000)) + '</client></clientlist></shop>',
+    'repeated shell data': f'<shop><name>S</name><name>T</name><clientlist><name>A</name>{clients(0, 1000)}</clientlist>'
+                           f'<clientlist><name>B</name>{clients(1000, 1000)}</clientlist></shop>\n',
+    'repeated element data': f'<shop><name>S</name><clientlist><client id="1"><name>P</name><name>Q</name>'
+                             + ''.join(f'<birthday year="{i}"/>' for i in range(20000)) + '</client></clientlist></shop>',
+}
+
+
+@pytest.mark.parametrize('name', DOCUMENTS)
+def test_memory_keeps_the_rows(convert, capsys, name):
+    rows = convert(DOCUMENTS[name], SCRIPT)
+    assert len(rows) > 1
+    assert convert(DOCUMENTS[name], SCRIPT, '-memory', '0.1') == rows
+    assert ('evaluated as a whole' in capsys.readouterr().err) == name.startswith('repeated')
+
+
+def test_positional_fields_are_not_split(convert):
+    script = SCRIPT.replace('header: !id', 'header: !id, name.1')
+    document = DOCUMENTS['trailing data']
+    assert convert(document, script, '-memory', '0.1') == convert(document, script)
+
+
+def test_split():
+    split = lambda text: pymala.load_script(text, {}).split()
+    assert split(SCRIPT) == ['clientlist', 'client', 'birthday']
+    assert split('*.clientlist\nx = client\ny = client.name') == ['clientlist']
+    assert split('n = *.name\n*.clientlist.client\nx = name') == []
+    assert split('all = shop\n*.clientlist.client\nx = name') == []
+    assert split(SCRIPT.replace('header: !id', 'header: !id, name.1')) == []
+
+
+def test_spill_elements(tmp_path):
+    document = tmp_path / 'shop.xml'
+    document.write_text(DOCUMENTS['trailing data'], encoding = 'utf-8')
+    spill = pymala.PymalaSpill((str(document), 0, -1), ['clientlist', 'client'], memory = 262144)
+    [element] = list(spill.elements())
+    assert isinstance(element, pymala.PymalaSpill)
+    assert element.shell == ('<shop>', '<name>TheShop</name></shop>\n')
+    texts = [p.pymala for p in element.elements()]
+    assert len(texts) > 1 and all(text.startswith('<shop><clientlist>\n<client ') for text in texts)
+    assert all(text.endswith('</client>\n</clientlist><name>TheShop</name></shop>\n') for text in texts)
@@ -0,0 +1,36 @@
+import pytest
+
+import pymala
+
+SCRIPT = 'root: shop\nheader: !id\ninp: data/*.xml\nout: shops.txt\nshop = shop.name\n*.client\nid = :id\n'
+
+
+@pytest.fixture
+def job(tmp_path):
+    (tmp_path / 'data').mkdir()
+    for i in range(3): (tmp_path / 'data' / f'shop{i}.xml').write_text(f'<shop><name>s{i}</name><client id="{i}"/></shop>')
+    (tmp_path / 'shops.mala').write_text(SCRIPT)
+    return {'argv': ['shops'], 'cwd': str(tmp_path)}
+
+
+def test_job_settings(job, tmp_path):
+    text, para = pymala.job_settings(job['argv'], job['cwd'])
+    assert text == SCRIPT
+    assert para['inp'] == str(tmp_path / 'data' / '*.xml')
+    assert para['out'] == str(tmp_path / 'shops.txt')
+
+
+def test_server_job(job, tmp_path, monkeypatch):
+    monkeypatch.setenv('PYMALA_TOKEN', 'secret')
+    server = pymala.PymalaServer(1)
+    try:
+        with pytest.raises(PermissionError): server.run(job)
+        result = server.run(dict(job, token = 'secret'))
+    finally: server.close()
+    assert result['docs'] == 3 and result['rows'] == 3
+    assert sorted((tmp_path / 'shops.txt').read_text().splitlines()) == ['0\ts0', '1\ts1', '2\ts2', 'id\tshop']
+
+
+def test_loopback():
+    assert pymala.loopback('localhost') and pymala.loopback('127.0.0.1')
+    assert not pymala.loopback('0.0.0.0')
@@ -0,0 +1,21 @@
+import pymala
+
+
+def test_paused_processes_block():
+    tuner = pymala.Tuner(interval = 0)
+    tuner.start(3)
+    tuner.adapt(1.0)
+    tuner.adapt(1.0)
+    assert tuner.limit.value == 1
+    assert [gate.is_set() for gate in tuner.gates] == [True, False, False]
+    tuner.adapt(0.0)
+    assert tuner.limit.value == 2
+    assert [gate.is_set() for gate in tuner.gates] == [True, True, False]
+
+
+def test_auto_mode(convert, monkeypatch):
+    monkeypatch.setattr(pymala, 'cpu_count', lambda: 4)
+    document = '<shops>' + ''.join([f'<shop><name>s{i}</name><client id="{i}"><name>c{i}</name></client></shop>' for i in range(200)]) + '</shops>'
+    script = 'root: shop\nheader: !id\nshop = shop.name\n*.client\nid = :id\nclient = name\n'
+    rows = convert(document, script, '-mp', 'auto', '-chunk', 'auto')
+    assert sorted(rows[1:]) == sorted([f'{i}\ts{i}\tc{i}' for i in range(200)])
@@ -0,0 +1,55 @@
+from time import sleep
+
+import pymala
+
+SHOP = '<shop><name>{0}</name><clientlist><client id="{0}"><name>Paul</name></client></clientlist></shop>\n'
+SCRIPT = 'root: shop\nheader: !id\nshop = shop.name\n*.clientlist\n.client\nid = :id\nname = name\n'
+
+
+def scan(watcher):
+    return watcher._Watcher__scan()
+
+
+def test_appended_part(tmp_path):
+    document = tmp_path / 'shops.xml'
+    document.write_text(SHOP.format(1))
+    watcher = pymala.Watcher(str(tmp_path / '*.xml'), 0, append = True)
+    [(file, signature, begin, previous)] = scan(watcher)
+    assert begin == 0 and previous == None
+    with open(document, 'a') as f: f.write(SHOP.format(2))
+    [(file, signature, begin, previous)] = scan(watcher)
+    assert begin == len(SHOP.format(1))
+    lines, pymalas = pymala.serve_collect(('key', SCRIPT, [(file, begin, -1)], {'root': 'shop'}))
+    assert (lines, pymalas) == (['2\t2\tPaul'], 1)
+
+
+def test_rewritten_file_is_processed_as_a_whole(tmp_path):
+    document = tmp_path / 'shops.xml'
+    document.write_text(SHOP.format(1))
+    watcher = pymala.Watcher(str(tmp_path / '*.xml'), 0, append = True)
+    scan(watcher)
+    document.write_text(SHOP.format(3) + SHOP.format(2))
+    [(file, signature, begin, previous)] = scan(watcher)
+    assert begin == 0
+
+
+def test_retry(tmp_path):
+    (tmp_path / 'shops.xml').write_text(SHOP.format(1))
+    watcher = pymala.Watcher(str(tmp_path / '*.xml'), 0)
+    for attempt in range(pymala.Watcher.RETRIES - 1):
+        [(file, signature, begin, previous)] = scan(watcher)
+        assert watcher.retry(file, signature, previous)
+    [(file, signature, begin, previous)] = scan(watcher)
+    assert not watcher.retry(file, signature, previous)
+    assert scan(watcher) == []
+
+
+def test_watched_files_are_polled_after_overflow(tmp_path):
+    watcher = pymala.Watcher(str(tmp_path / '*.xml'), 0.05, patience = 1000)
+    watcher.watched = {str(tmp_path)}
+    (tmp_path / 'shops.xml').write_text(SHOP.format(1))
+    assert scan(watcher) == []
+    sleep(0.1)
+    assert scan(watcher) == [] # waits for an event
+    watcher.overflow = True
+    assert [report[0] for report in scan(watcher)] == [str(tmp_path / 'shops.xml')]